@@ -1,18 +1,79 @@
 # agent.py
 """Google ADK agent definition with Playwright and Chrome DevTools MCP toolsets."""
 
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from functools import lru_cache
+
 from google.adk import Agent
 from google.adk.agents import LoopAgent
 from google.adk.tools import LongRunningFunctionTool, FunctionTool
 from google.adk.tools.mcp_tool import McpToolset, StdioConnectionParams
 from mcp import StdioServerParameters
 
+# Canonical agent module: any other entry point should import from here
+# (e.g. `from agent import *`) rather than carrying its own copy.
+__all__ = [
+    "TASK_INSTRUCTION",
+    "CachedMcpToolset",
+    "request_human_auth",
+    "inject_fake_audio",
+    "start_audio_capture",
+    "stop_audio_capture",
+    "mark_task_complete",
+    "expand_ref",
+    "build_agent",
+    "warm_toolsets",
+]
+
+
+class CachedMcpToolset(McpToolset):
+    """McpToolset that memoizes the tool list for a short TTL.
+
+    ADK re-enumerates each toolset's tools before every LLM turn, which costs a
+    full ListTools round-trip to the MCP stdio server per toolset per turn. The
+    available browser tools never change mid-task, so cache the result and only
+    re-query the server once the TTL expires (or after the connection closes).
+    """
+
+    def __init__(self, *, cache_ttl_seconds: float = 300.0, **kwargs):
+        super().__init__(**kwargs)
+        self._cache_ttl_seconds = cache_ttl_seconds
+        self._cached_tools = None
+        self._cache_ts = 0.0
+
+    async def get_tools(self, readonly_context=None):
+        now = time.monotonic()
+        if self._cached_tools is not None and now - self._cache_ts < self._cache_ttl_seconds:
+            return self._cached_tools
+        tools = await super().get_tools(readonly_context)
+        self._cached_tools = tools
+        self._cache_ts = now
+        return tools
+
+    async def close(self):
+        # Invalidate on connection teardown so a reconnect re-lists tools.
+        self._cached_tools = None
+        await super().close()
+
+# This instruction is the static prefix of every LLM call in the loop (up to
+# max_iterations of them per task). Keep it byte-identical across turns -- all
+# task-specific text goes in the user message, strictly after this block -- so
+# provider-side prompt caching (OpenAI/Anthropic/Gemini) can serve turns 2+
+# from cache instead of re-billing the full prefix.
 TASK_INSTRUCTION = """You are a web task automation agent. You execute tasks on web pages.
 
 ## Your workflow for each task:
 
 1. **Navigate** to the given URL using Playwright browser tools.
-2. **Check for authentication**: If you see a login form, CAPTCHA, or 2FA prompt, call `request_human_auth` with a description of what you see. Wait for the response before continuing.
+2. **Check for authentication**: If you see a login form, CAPTCHA, or 2FA prompt, call `request_human_auth` with a description of what you see. Call it ONCE and stop -- the human's completion is delivered to you as that call's response; never re-invoke it to poll for status.
 3. **Execute the instructions** step by step using Playwright tools (click, type, fill, select, etc.). Use `browser_snapshot` to inspect the page state when needed.
 4. **Take a screenshot** after completing the instructions using Chrome DevTools `take_screenshot` tool.
 5. **Report completion** by calling `mark_task_complete` with status "success" and a brief summary.
@@ -34,23 +95,33 @@ If the task involves a website that plays audio (music, speech, notifications, s
 2. Execute the returned JS via Playwright's `browser_evaluate` BEFORE audio starts playing.
 3. Let the page play audio normally while you complete other task steps.
 4. When done, call `stop_audio_capture` to get JS that finalizes the recording.
-5. Execute that JS via `browser_evaluate` -- it encodes the recording as base64 WAV.
-6. Read the base64 data: execute `window.__audioCaptureResult` via `browser_evaluate`.
-7. Pass the base64 string as the `audio_data` parameter when calling `mark_task_complete`.
+5. Execute that JS via `browser_evaluate` -- it uploads the WAV to the orchestrator (or encodes it as base64 if upload is unavailable).
+6. Read the result: execute `window.__audioCaptureResult` via `browser_evaluate`. It is either an `uploaded:<filename>` marker or a base64 WAV string.
+7. Pass that string unchanged as the `audio_data` parameter when calling `mark_task_complete`.
 
 ## Important rules:
 - Do NOT ask the human for help except via `request_human_auth` for login/2FA.
 - Use `browser_snapshot` to understand page structure before interacting with elements.
 - Wait for page loads and animations to complete before interacting.
 - Be precise with selectors -- prefer accessible names and roles over CSS selectors.
+- Large tool outputs may be replaced by a short reference ({"ref": "blobref:..."}) with a preview. Work from the preview when it is enough; call `expand_ref` with the ref when you need the full content.
 """
 
+# Interned so every LlmRequest references the same string object.
+TASK_INSTRUCTION = sys.intern(TASK_INSTRUCTION)
+
 
 def request_human_auth(description: str) -> dict:
     """Pause execution and request the human to authenticate in the browser.
 
     Call this when you detect a login form, CAPTCHA, or 2FA prompt.
 
+    This is deliberately NOT a blocking wait: LongRunningFunctionTool's
+    protocol is to return "pending" immediately so ADK surfaces the call id in
+    long_running_tool_ids; the orchestrator pauses on that event and later
+    resumes the agent with a FunctionResponse carrying the real outcome.
+    Blocking in here would stall the event stream the orchestrator watches.
+
     Args:
         description: What you see that requires authentication (e.g., "Login form at example.com")
 
@@ -60,6 +131,31 @@ def request_human_auth(description: str) -> dict:
     return {"status": "pending", "message": description}
 
 
+# JS payloads for the audio tools are static (or parameterized by two numbers),
+# so build them once at import time instead of re-concatenating per call.
+_INJECT_FAKE_AUDIO_TMPL = (
+    "(()=>{{"
+    "const ctx=new AudioContext();"
+    "const osc=ctx.createOscillator();"
+    "osc.frequency.setValueAtTime({frequency},ctx.currentTime);"
+    "const dest=ctx.createMediaStreamDestination();"
+    "osc.connect(dest);osc.start();"
+    "setTimeout(()=>osc.stop(),{duration_ms});"
+    "const orig=navigator.mediaDevices.getUserMedia.bind(navigator.mediaDevices);"
+    "navigator.mediaDevices.getUserMedia=async(c)=>{{"
+    "if(c&&c.audio){{const s=dest.stream;"
+    "if(c.video){{const v=await orig({{video:c.video}});"
+    "v.getAudioTracks().forEach(t=>s.addTrack(t));return s;}}"
+    "return s;}}return orig(c);}};"
+    "return 'Audio injection active';}})()"
+)
+
+_INJECT_FAKE_AUDIO_INSTRUCTION = (
+    "Execute this JS via browser_evaluate to inject fake audio. "
+    "Do this BEFORE the page calls getUserMedia (before clicking record/call buttons)."
+)
+
+
 def inject_fake_audio(frequency: float = 440.0, duration: float = 10.0) -> dict:
     """Get JavaScript code that injects a synthetic audio tone into the page.
 
@@ -76,50 +172,33 @@ def inject_fake_audio(frequency: float = 440.0, duration: float = 10.0) -> dict:
     Returns:
         Dict with 'js' key containing the JavaScript code to execute via browser_evaluate.
     """
-    js_code = (
-        "(()=>{"
-        "const ctx=new AudioContext();"
-        "const osc=ctx.createOscillator();"
-        f"osc.frequency.setValueAtTime({frequency},ctx.currentTime);"
-        "const dest=ctx.createMediaStreamDestination();"
-        "osc.connect(dest);osc.start();"
-        f"setTimeout(()=>osc.stop(),{int(duration*1000)});"
-        "const orig=navigator.mediaDevices.getUserMedia.bind(navigator.mediaDevices);"
-        "navigator.mediaDevices.getUserMedia=async(c)=>{"
-        "if(c&&c.audio){const s=dest.stream;"
-        "if(c.video){const v=await orig({video:c.video});"
-        "v.getAudioTracks().forEach(t=>s.addTrack(t));return s;}"
-        "return s;}return orig(c);};"
-        "return 'Audio injection active';})()"
-    )
     return {
-        "js": js_code,
-        "instruction": (
-            "Execute this JS via browser_evaluate to inject fake audio. "
-            "Do this BEFORE the page calls getUserMedia (before clicking record/call buttons)."
+        "js": _INJECT_FAKE_AUDIO_TMPL.format(
+            frequency=frequency, duration_ms=int(duration * 1000)
         ),
+        "instruction": _INJECT_FAKE_AUDIO_INSTRUCTION,
     }
 
 
-def start_audio_capture() -> dict:
-    """Get JavaScript code that starts capturing audio output from the page.
-
-    Call this when a task involves a website that plays audio. Execute the
-    returned JS via Playwright's browser_evaluate BEFORE audio starts playing.
-
-    The script intercepts audio from <audio>/<video> elements and Web Audio API,
-    recording raw PCM data into window.__audioCapture.
-
-    Returns:
-        Dict with 'js' key containing the JavaScript code to execute via browser_evaluate,
-        and 'instruction' key with usage guidance.
-    """
-    js_code = """(()=>{
+_START_CAPTURE_JS = """(async()=>{
 if(window.__audioCapture&&window.__audioCapture.active){return 'Audio capture already active';}
 const ctx=new (window.AudioContext||window.webkitAudioContext)();
 const dest=ctx.createMediaStreamDestination();
 const chunks=[];
-const processor=ctx.createScriptProcessor(4096,2,2);
+let processor=null;
+try{
+const workletSrc="class __CaptureProc extends AudioWorkletProcessor{process(inputs){const inp=inputs[0];if(inp.length>0){const L=new Float32Array(inp[0]);const R=inp.length>1?new Float32Array(inp[1]):new Float32Array(inp[0]);this.port.postMessage({left:L,right:R},[L.buffer,R.buffer]);}return true;}}registerProcessor('capture-processor',__CaptureProc);";
+await ctx.audioWorklet.addModule(URL.createObjectURL(new Blob([workletSrc],{type:'application/javascript'})));
+processor=new AudioWorkletNode(ctx,'capture-processor',{numberOfInputs:1,channelCount:2});
+processor.port.onmessage=(e)=>{chunks.push(e.data);};
+ctx.createMediaStreamSource(dest.stream).connect(processor);
+// The rendering graph only pulls nodes that reach a destination, so route the
+// worklet through a zero-gain node (muted: playback already goes to
+// ctx.destination via the media-element hook below) or process() never runs.
+const mute=ctx.createGain();mute.gain.value=0;
+processor.connect(mute);mute.connect(ctx.destination);
+}catch(err){
+processor=ctx.createScriptProcessor(4096,2,2);
 dest.stream.getAudioTracks().forEach(t=>{
 const src=ctx.createMediaStreamSource(new MediaStream([t]));
 src.connect(processor);
@@ -130,6 +209,7 @@ const R=e.inputBuffer.numberOfChannels>1?new Float32Array(e.inputBuffer.getChann
 chunks.push({left:L,right:R});
 };
 processor.connect(ctx.destination);
+}
 const origPlay=HTMLMediaElement.prototype.play;
 HTMLMediaElement.prototype.play=function(){
 try{
@@ -145,28 +225,35 @@ return origPlay.apply(this,arguments);
 window.__audioCapture={active:true,ctx:ctx,dest:dest,processor:processor,chunks:chunks,origPlay:origPlay,sampleRate:ctx.sampleRate};
 return 'Audio capture started at '+ctx.sampleRate+'Hz';
 })()"""
-    return {
-        "js": js_code,
-        "instruction": (
-            "Execute this JS via browser_evaluate to start capturing tab audio. "
-            "Do this BEFORE audio starts playing on the page. "
-            "Call stop_audio_capture when done to retrieve the recorded WAV data."
-        ),
-    }
 
+_START_CAPTURE_RESULT = {
+    "js": _START_CAPTURE_JS,
+    "instruction": (
+        "Execute this JS via browser_evaluate to start capturing tab audio. "
+        "Do this BEFORE audio starts playing on the page. "
+        "Call stop_audio_capture when done to retrieve the recorded WAV data."
+    ),
+}
 
-def stop_audio_capture() -> dict:
-    """Get JavaScript code that stops audio capture and returns WAV data.
 
-    Call this after the page has finished playing audio. Execute the returned JS
-    via Playwright's browser_evaluate. The result will be a base64-encoded WAV
-    string stored on window.__audioCaptureResult.
+def start_audio_capture() -> dict:
+    """Get JavaScript code that starts capturing audio output from the page.
+
+    Call this when a task involves a website that plays audio. Execute the
+    returned JS via Playwright's browser_evaluate BEFORE audio starts playing.
+
+    The script intercepts audio from <audio>/<video> elements and Web Audio API,
+    recording raw PCM data into window.__audioCapture.
 
     Returns:
         Dict with 'js' key containing the JavaScript code to execute via browser_evaluate,
         and 'instruction' key with usage guidance.
     """
-    js_code = """(()=>{
+    # Copy so callers can't mutate the shared constant.
+    return dict(_START_CAPTURE_RESULT)
+
+
+_STOP_CAPTURE_JS = """(async()=>{
 if(!window.__audioCapture||!window.__audioCapture.active){return JSON.stringify({error:'No active audio capture'});}
 const cap=window.__audioCapture;
 cap.processor.disconnect();
@@ -185,11 +272,11 @@ for(let i=0;i<chunks.length;i++){totalSamples+=chunks[i].left.length;}
 const dataSize=totalSamples*numChannels*(bitsPerSample/8);
 const buffer=new ArrayBuffer(44+dataSize);
 const view=new DataView(buffer);
-function writeStr(offset,str){for(let i=0;i<str.length;i++){view.setUint8(offset+i,str.charCodeAt(i));}}
-writeStr(0,'RIFF');
+const header=new Uint8Array(buffer);
+const enc=new TextEncoder();
+header.set(enc.encode('RIFF'),0);
 view.setUint32(4,36+dataSize,true);
-writeStr(8,'WAVE');
-writeStr(12,'fmt ');
+header.set(enc.encode('WAVEfmt '),8);
 view.setUint32(16,16,true);
 view.setUint16(20,1,true);
 view.setUint16(22,numChannels,true);
@@ -197,37 +284,75 @@ view.setUint32(24,sampleRate,true);
 view.setUint32(28,sampleRate*numChannels*(bitsPerSample/8),true);
 view.setUint16(32,numChannels*(bitsPerSample/8),true);
 view.setUint16(34,bitsPerSample,true);
-writeStr(36,'data');
+header.set(enc.encode('data'),36);
 view.setUint32(40,dataSize,true);
-let offset=44;
+const i16=new Int16Array(buffer,44,totalSamples*numChannels);
+let k=0;
 for(let i=0;i<chunks.length;i++){
 const L=chunks[i].left;
 const R=chunks[i].right;
 for(let j=0;j<L.length;j++){
-const lSample=Math.max(-1,Math.min(1,L[j]));
-view.setInt16(offset,lSample<0?lSample*0x8000:lSample*0x7FFF,true);
-offset+=2;
-const rSample=Math.max(-1,Math.min(1,R[j]));
-view.setInt16(offset,rSample<0?rSample*0x8000:rSample*0x7FFF,true);
-offset+=2;
+let l=L[j];if(l<-1)l=-1;else if(l>1)l=1;
+i16[k++]=(l<0?l*0x8000:l*0x7FFF)|0;
+let r=R[j];if(r<-1)r=-1;else if(r>1)r=1;
+i16[k++]=(r<0?r*0x8000:r*0x7FFF)|0;
 }
 }
+if(window.__audioCaptureUrl){URL.revokeObjectURL(window.__audioCaptureUrl);}
+window.__audioCaptureBlob=new Blob([buffer],{type:'audio/wav'});
+window.__audioCaptureUrl=URL.createObjectURL(window.__audioCaptureBlob);
+let result='';
+const uploadUrl='__AUDIO_UPLOAD_URL__';
+if(uploadUrl){
+try{
+const resp=await fetch(uploadUrl,{method:'POST',body:new Blob([buffer])});
+if(resp.ok){result='uploaded:__AUDIO_UPLOAD_NAME__';}
+}catch(e){}
+}
+if(!result){
 const bytes=new Uint8Array(buffer);
-let binary='';
-for(let i=0;i<bytes.length;i++){binary+=String.fromCharCode(bytes[i]);}
-const b64=btoa(binary);
-window.__audioCaptureResult=b64;
+const parts=[];
+for(let i=0;i<bytes.length;i+=8192){parts.push(String.fromCharCode.apply(null,bytes.subarray(i,i+8192)));}
+result=btoa(parts.join(''));
+}
+window.__audioCaptureResult=result;
 const durationSec=totalSamples/sampleRate;
-return JSON.stringify({status:'stopped',samples:totalSamples,duration_sec:durationSec,size_bytes:buffer.byteLength,audio:b64.substring(0,50)+'...'});
+return JSON.stringify({status:'stopped',samples:totalSamples,duration_sec:durationSec,size_bytes:buffer.byteLength,url:window.__audioCaptureUrl,result:result.substring(0,50)+'...'});
 })()"""
-    return {
-        "js": js_code,
-        "instruction": (
-            "Execute this JS via browser_evaluate to stop audio capture and encode as WAV. "
-            "The base64-encoded WAV is stored on window.__audioCaptureResult. "
-            "The orchestrator will automatically collect and save it."
-        ),
-    }
+
+_STOP_CAPTURE_INSTRUCTION = (
+    "Execute this JS via browser_evaluate to stop audio capture and finalize the WAV. "
+    "window.__audioCaptureResult holds either an 'uploaded:<filename>' marker (the WAV "
+    "was posted straight to the orchestrator, no base64 round-trip) or a base64-encoded "
+    "WAV as fallback. Pass it unchanged to mark_task_complete(audio_data=...)."
+)
+
+
+def stop_audio_capture() -> dict:
+    """Get JavaScript code that stops audio capture and returns WAV data.
+
+    Call this after the page has finished playing audio. Execute the returned JS
+    via Playwright's browser_evaluate. When the orchestrator's local upload
+    endpoint is available (AUDIO_UPLOAD_PORT), the WAV bytes are POSTed to it
+    directly -- skipping the base64 encode in the page and the decode in the
+    orchestrator, a ~13 MB string round-trip for a 10 MB recording -- and
+    window.__audioCaptureResult holds an 'uploaded:<filename>' marker.
+    Otherwise it falls back to the base64 string as before.
+
+    Returns:
+        Dict with 'js' key containing the JavaScript code to execute via browser_evaluate,
+        and 'instruction' key with usage guidance.
+    """
+    port = os.environ.get("AUDIO_UPLOAD_PORT", "").strip()
+    if port:
+        fname = f"upload_{time.time_ns()}.wav"
+        url = f"http://127.0.0.1:{port}/audio/{fname}"
+    else:
+        fname = url = ""
+    js = _STOP_CAPTURE_JS.replace("__AUDIO_UPLOAD_URL__", url).replace(
+        "__AUDIO_UPLOAD_NAME__", fname
+    )
+    return {"js": js, "instruction": _STOP_CAPTURE_INSTRUCTION}
 
 
 def mark_task_complete(status: str, summary: str, tool_context, audio_data: str = "") -> dict:  # noqa: ANN001 -- injected by ADK FunctionTool
@@ -236,7 +361,8 @@ def mark_task_complete(status: str, summary: str, tool_context, audio_data: str
     Args:
         status: "success" or "failed"
         summary: Brief description of what happened
-        audio_data: Optional base64-encoded WAV audio data from stop_audio_capture
+        audio_data: Optional audio result from stop_audio_capture -- either a
+            base64-encoded WAV or an 'uploaded:<filename>' marker
 
     Returns:
         The status, summary, and audio_data for the orchestrator.
@@ -245,50 +371,415 @@ def mark_task_complete(status: str, summary: str, tool_context, audio_data: str
     return {"status": status, "summary": summary, "audio_data": audio_data}
 
 
-def build_agent(
-    cdp_endpoint: str = "http://localhost:9222",
-    model: str = "openai/gpt-5.2",
-) -> LoopAgent:
-    """Build the LoopAgent with task executor sub-agent.
+def _resolve_mcp_bin(env_var: str, exe_name: str) -> str | None:
+    """Resolve a preinstalled MCP server binary, or None to fall back to npx.
 
-    Args:
-        cdp_endpoint: CDP endpoint URL for connecting to Chrome.
-        model: LLM model string for ADK (e.g. "openai/gpt-5.2", "vertex_ai/gemini-2.5-flash").
+    `npx -y <pkg>@latest` re-resolves the registry and re-walks node_modules on
+    every spawn -- hundreds of ms even with a warm cache, plus @latest can pull
+    surprise upgrades. A global install (`npm i -g @playwright/mcp
+    chrome-devtools-mcp`) pins the version and starts straight from node.
+    """
+    path = os.environ.get(env_var, "").strip()
+    if path and os.path.isfile(path):
+        return path
+    return shutil.which(exe_name)
 
-    Returns:
-        LoopAgent wrapping the task executor.
+
+# Resolved once at import; npx remains the zero-setup fallback.
+_PLAYWRIGHT_MCP_BIN = _resolve_mcp_bin("PLAYWRIGHT_MCP_PATH", "mcp-server-playwright")
+_CDT_MCP_BIN = _resolve_mcp_bin("CHROME_DEVTOOLS_MCP_PATH", "chrome-devtools-mcp")
+
+
+@lru_cache(maxsize=8)
+def _get_toolsets(
+    cdp_endpoint: str, isolated: bool = False
+) -> tuple[CachedMcpToolset, CachedMcpToolset]:
+    """Return the (Playwright, Chrome DevTools) toolset pair for a CDP endpoint.
+
+    Each McpToolset spawns an npx subprocess and performs the MCP initialize
+    handshake, which dominates build_agent time. Memoizing on the endpoint
+    amortizes that cold start across repeated build_agent calls.
+
+    With isolated=True the Playwright MCP server opens its own BrowserContext
+    inside the shared Chrome instead of reusing the default one, so several
+    agents can fan out over one browser process (~20MB per extra context
+    instead of a whole Chrome launch each).
     """
-    playwright_toolset = McpToolset(
+    if _PLAYWRIGHT_MCP_BIN:
+        playwright_command, playwright_args = _PLAYWRIGHT_MCP_BIN, []
+    else:
+        playwright_command, playwright_args = "npx", ["-y", "@playwright/mcp@latest"]
+    playwright_args += ["--cdp-endpoint", cdp_endpoint]
+    if isolated:
+        playwright_args.append("--isolated")
+    playwright_toolset = CachedMcpToolset(
         connection_params=StdioConnectionParams(
             server_params=StdioServerParameters(
-                command="npx",
-                args=["-y", "@playwright/mcp@latest", "--cdp-endpoint", cdp_endpoint],
+                command=playwright_command,
+                args=playwright_args,
             ),
             timeout=30.0,
         ),
     )
 
-    chrome_devtools_toolset = McpToolset(
+    if _CDT_MCP_BIN:
+        cdt_command, cdt_args = _CDT_MCP_BIN, []
+    else:
+        cdt_command, cdt_args = "npx", ["-y", "chrome-devtools-mcp@latest"]
+    chrome_devtools_toolset = CachedMcpToolset(
         connection_params=StdioConnectionParams(
             server_params=StdioServerParameters(
-                command="npx",
-                args=["-y", "chrome-devtools-mcp@latest", "--browser-url", cdp_endpoint],
+                command=cdt_command,
+                args=cdt_args + ["--browser-url", cdp_endpoint],
             ),
             timeout=30.0,
         ),
     )
 
+    return playwright_toolset, chrome_devtools_toolset
+
+
+async def warm_toolsets(
+    cdp_endpoint: str = "http://localhost:9222", isolated: bool = False
+) -> None:
+    """Initialize both MCP toolsets concurrently.
+
+    ADK enumerates toolsets sequentially on first use, paying two serial MCP
+    initialize + list-tools round-trips. Issuing both with asyncio.gather
+    halves the warmup wall-clock and primes the CachedMcpToolset caches.
+    Call this right after build_agent, before the first task runs.
+    """
+    toolsets = _get_toolsets(cdp_endpoint, isolated)
+    await asyncio.gather(*(toolset.get_tools() for toolset in toolsets))
+
+
+@atexit.register
+def _close_cached_toolsets() -> None:
+    """Close any MCP toolsets still alive at interpreter exit."""
+    cache_info = _get_toolsets.cache_info()
+    if cache_info.currsize == 0:
+        return
+    for key in list(_toolset_endpoints):
+        for toolset in _get_toolsets(*key):
+            try:
+                asyncio.run(toolset.close())
+            except Exception:
+                pass
+
+
+# (endpoint, isolated) keys seen by _get_toolsets, for _close_cached_toolsets.
+_toolset_endpoints: set[tuple[str, bool]] = set()
+
+
+# The two MCP toolsets expose dozens of browser tools whose schemas dominate
+# the prompt even when a task only needs a handful of them. Before each LLM
+# call, rank tool declarations against the conversation text and keep only the
+# top-K most relevant ones. Ranking is plain token overlap -- no embedding
+# model dependency -- which is enough to separate e.g. form-filling tools from
+# PDF/tab/network tools. Set TOOL_FILTER_TOP_K=0 to disable.
+_TOOL_FILTER_TOP_K = int(os.environ.get("TOOL_FILTER_TOP_K", "20"))
+
+# Tools that must survive filtering regardless of score: the loop exit and the
+# auth pause are load-bearing, snapshot is the model's primary sensor, and the
+# whole audio workflow hinges on executing returned JS via browser_evaluate --
+# token overlap alone would happily prune those on an audio task.
+_ALWAYS_KEPT_TOOLS = frozenset(
+    {
+        "mark_task_complete",
+        "request_human_auth",
+        "browser_snapshot",
+        "take_screenshot",
+        "expand_ref",
+        "browser_evaluate",
+        "inject_fake_audio",
+        "start_audio_capture",
+        "stop_audio_capture",
+    }
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokenize(text: str) -> frozenset[str]:
+    return frozenset(_TOKEN_RE.findall(text.lower()))
+
+
+@lru_cache(maxsize=256)
+def _tool_tokens(name: str, description: str) -> frozenset[str]:
+    return _tokenize(f"{name} {description}")
+
+
+def _filter_tools_by_relevance(callback_context, llm_request) -> None:
+    """before_model_callback that prunes low-relevance tool declarations.
+
+    The kept set is ranked once per session against the initial user message
+    (the task prompt) and frozen in state. Re-ranking each turn against the
+    growing conversation would change the declaration block between turns,
+    and provider prompt caches key on the prefix including tool schemas --
+    a shifting set would forfeit exactly the turns-2+ cache hits the stable
+    prompt layout is built for.
+    """
+    if _TOOL_FILTER_TOP_K <= 0:
+        return None
+
+    kept = callback_context.state.get("kept_tools")
+    if kept is None:
+        query = frozenset()
+        for content in llm_request.contents or []:
+            if content.role == "user":
+                query = _tokenize(
+                    " ".join(p.text for p in content.parts or [] if p.text)
+                )
+                break
+        if not query:
+            return None
+        kept = set(_ALWAYS_KEPT_TOOLS)
+        for tool in llm_request.config.tools or []:
+            declarations = getattr(tool, "function_declarations", None)
+            if not declarations or len(declarations) <= _TOOL_FILTER_TOP_K:
+                continue
+            scored = sorted(
+                declarations,
+                key=lambda d: len(query & _tool_tokens(d.name, d.description or "")),
+                reverse=True,
+            )
+            kept.update(d.name for d in scored[:_TOOL_FILTER_TOP_K])
+        # State values must be JSON-serializable for persistent backends.
+        callback_context.state["kept_tools"] = sorted(kept)
+
+    kept = set(kept)
+    for tool in llm_request.config.tools or []:
+        declarations = getattr(tool, "function_declarations", None)
+        if not declarations or len(declarations) <= _TOOL_FILTER_TOP_K:
+            continue
+        tool.function_declarations = [d for d in declarations if d.name in kept]
+    return None
+
+
+# Tool results larger than this (serialized) are swapped for a short
+# content-addressed reference; the full payload stays in session state.
+_BLOB_MIN_BYTES = 4096
+_BLOB_PREVIEW_CHARS = 256
+
+# Tools whose results must never be compacted: the orchestrator reads
+# mark_task_complete directly, the auth tool is part of the pause protocol,
+# the audio tools return JS the model must execute verbatim, and
+# browser_evaluate results feed values (e.g. captured audio) back into
+# other tool arguments.
+_COMPACT_EXEMPT_TOOLS = frozenset(
+    {
+        "mark_task_complete",
+        "request_human_auth",
+        "inject_fake_audio",
+        "start_audio_capture",
+        "stop_audio_capture",
+        "browser_evaluate",
+        "expand_ref",
+    }
+)
+
+
+def _serialize_tool_response(tool_response) -> str:
+    if isinstance(tool_response, str):
+        return tool_response
+    try:
+        return json.dumps(tool_response, default=str)
+    except TypeError:
+        return str(tool_response)
+
+
+def _compact_payload(tool_context, tool_response):
+    """Swap a large tool result for a reference dict; None if it is small."""
+    payload = _serialize_tool_response(tool_response)
+    if len(payload) < _BLOB_MIN_BYTES:
+        return None
+    ref = hashlib.sha1(payload.encode()).hexdigest()
+    tool_context.state[f"blob:{ref}"] = payload
+    return {
+        "ref": f"blobref:{ref}",
+        "preview": payload[:_BLOB_PREVIEW_CHARS],
+        "note": "Large output stored out of context. Call expand_ref with the ref to read it in full.",
+    }
+
+
+def _compact_large_tool_result(tool, args, tool_context, tool_response):
+    """after_tool_callback that keeps large tool outputs out of the context.
+
+    A browser_snapshot or take_screenshot result is re-embedded in the
+    conversation on every subsequent LLM call; replacing it with a short
+    handle plus preview cuts the per-iteration input tokens drastically while
+    expand_ref keeps the full payload reachable on demand.
+    """
+    if tool.name in _COMPACT_EXEMPT_TOOLS:
+        return None
+    return _compact_payload(tool_context, tool_response)
+
+
+def expand_ref(ref: str, tool_context) -> dict:  # noqa: ANN001 -- injected by ADK FunctionTool
+    """Fetch the full content of a large tool output that was replaced by a reference.
+
+    Args:
+        ref: The 'blobref:...' handle from a compacted tool result.
+
+    Returns:
+        Dict with 'content' holding the full payload, or 'error' if unknown.
+    """
+    payload = tool_context.state.get(f"blob:{ref.removeprefix('blobref:')}")
+    if payload is None:
+        return {"error": f"Unknown ref: {ref}"}
+    return {"content": payload}
+
+
+# Tool calls that can change the DOM and therefore invalidate a cached
+# snapshot. Broad on purpose: a stale cache hit is worse than a spare re-walk.
+_MUTATING_TOOL_RE = re.compile(
+    r"browser_(click|type|fill|select|press|navigate|reload|drag|hover|evaluate"
+    r"|file_upload|key|tab|close|wait)"
+)
+
+
+def _snapshot_cache_lookup(tool, args, tool_context):
+    """before_tool_callback that serves browser_snapshot from cache.
+
+    A snapshot is a full accessibility-tree walk shipped over CDP. If no
+    DOM-mutating tool has run since the last snapshot, the tree cannot have
+    changed, so return the cached result instead of re-querying the browser.
+    """
+    if tool.name != "browser_snapshot":
+        return None
+    cache = tool_context.state.get("snapshot_cache")
+    if cache is not None and cache.get("version") == tool_context.state.get("dom_version", 0):
+        # Flag the hit for _detect_stalled_loop: a cache-served snapshot is
+        # byte-identical by construction, so it must not count as evidence
+        # that the page stopped moving.
+        tool_context.state["snapshot_cache_hit"] = True
+        return cache.get("result")
+    return None
+
+
+def _update_snapshot_cache(tool, args, tool_context, tool_response):
+    """after_tool_callback that records snapshots and tracks DOM mutations."""
+    if tool.name == "browser_snapshot":
+        # Cache the compacted form so cache hits return the same short
+        # reference the model saw the first time.
+        tool_context.state["snapshot_cache"] = {
+            "version": tool_context.state.get("dom_version", 0),
+            "result": _compact_payload(tool_context, tool_response) or tool_response,
+        }
+    elif tool.name == "request_human_auth" or _MUTATING_TOOL_RE.match(tool.name):
+        tool_context.state["dom_version"] = tool_context.state.get("dom_version", 0) + 1
+    return None
+
+
+# How many recent action fingerprints to keep for stall detection.
+_STALL_WINDOW = 3
+
+# Tools where repeating the exact same call is routine, not a stall: waiting
+# twice on a slow page or pressing ArrowDown twice to scroll are fine.
+_STALL_EXEMPT_TOOLS = frozenset({"browser_wait_for", "browser_wait", "browser_press_key"})
+
+# Consecutive identical calls needed before declaring a stall. Two identical
+# browser_snapshot calls are conclusive because the fingerprint includes the
+# page state; for other tools identical args alone are weaker evidence, so
+# match the orchestrator's LOOP_THRESHOLD of 3.
+_STALL_SNAPSHOT_REPEATS = 2
+_STALL_DEFAULT_REPEATS = 3
+
+
+def _action_fingerprint(tool_name: str, args: dict, tool_response) -> str:
+    """Hash a tool call (and, for snapshots, its output) into a short fingerprint."""
+    digest = hashlib.sha1(
+        f"{tool_name}|{json.dumps(args, sort_keys=True, default=str)}".encode()
+    )
+    if tool_name == "browser_snapshot":
+        # An unchanged accessibility tree means the page did not move on --
+        # include the output so only truly identical states match.
+        digest.update(repr(tool_response).encode())
+    return digest.hexdigest()
+
+
+def _detect_stalled_loop(tool, args, tool_context, tool_response):
+    """after_tool_callback that exits the retry loop when the agent is stuck.
+
+    Two identical browser_snapshot calls with an identical page state, or
+    three identical calls in a row for any other tool, mean further
+    iterations will just replay the same LLM+MCP round-trips. Escalate out
+    of the LoopAgent with a failed status instead -- the same mechanism
+    mark_task_complete uses. Wait- and key-press-style tools are exempt:
+    repeating those verbatim is normal interaction, not a stall.
+    """
+    if tool.name in ("mark_task_complete", "request_human_auth"):
+        return None
+    if tool.name in _STALL_EXEMPT_TOOLS:
+        return None
+    if tool_context.state.get("snapshot_cache_hit"):
+        # _snapshot_cache_lookup short-circuited the tool: the identical
+        # response only proves the cache worked, not that the page is stuck
+        # (the cache tracks tool-driven mutations, not async page updates).
+        tool_context.state["snapshot_cache_hit"] = False
+        return None
+    history = list(tool_context.state.get("stall_hashes", []))
+    history.append(_action_fingerprint(tool.name, args, tool_response))
+    history = history[-_STALL_WINDOW:]
+    tool_context.state["stall_hashes"] = history
+    needed = (
+        _STALL_SNAPSHOT_REPEATS
+        if tool.name == "browser_snapshot"
+        else _STALL_DEFAULT_REPEATS
+    )
+    if len(history) >= needed and len(set(history[-needed:])) == 1:
+        tool_context.state["loop_detected"] = True
+        tool_context.actions.escalate = True
+        # loop_detected lets the orchestrator recognize this replacement
+        # response and surface the summary as the task error -- there is no
+        # mark_task_complete call on this exit path.
+        return {
+            "status": "failed",
+            "loop_detected": True,
+            "summary": f"Aborted: repeated identical '{tool.name}' call with no page change",
+        }
+    return None
+
+
+@lru_cache(maxsize=16)
+def build_agent(
+    cdp_endpoint: str = "http://localhost:9222",
+    model: str = "openai/gpt-5.2",
+    isolated: bool = False,
+) -> LoopAgent:
+    """Build the LoopAgent with task executor sub-agent.
+
+    Memoized on the argument tuple: the agent graph is immutable after
+    construction and building it wires toolsets, tools and callbacks, so
+    repeat calls with the same endpoint/model return the cached graph.
+
+    Args:
+        cdp_endpoint: CDP endpoint URL for connecting to Chrome.
+        model: LLM model string for ADK (e.g. "openai/gpt-5.2", "vertex_ai/gemini-2.5-flash").
+        isolated: Give the Playwright MCP server its own BrowserContext inside
+            the shared Chrome instead of the default context.
+
+    Returns:
+        LoopAgent wrapping the task executor.
+    """
+    playwright_toolset, chrome_devtools_toolset = _get_toolsets(cdp_endpoint, isolated)
+    _toolset_endpoints.add((cdp_endpoint, isolated))
+
     auth_tool = LongRunningFunctionTool(func=request_human_auth)
     complete_tool = FunctionTool(func=mark_task_complete)
     audio_tool = FunctionTool(func=inject_fake_audio)
     audio_capture_start_tool = FunctionTool(func=start_audio_capture)
     audio_capture_stop_tool = FunctionTool(func=stop_audio_capture)
+    expand_ref_tool = FunctionTool(func=expand_ref)
 
     task_executor = Agent(
         name="task_executor",
         model=model,
         instruction=TASK_INSTRUCTION,
-        tools=[playwright_toolset, chrome_devtools_toolset, auth_tool, complete_tool, audio_tool, audio_capture_start_tool, audio_capture_stop_tool],
+        tools=[playwright_toolset, chrome_devtools_toolset, auth_tool, complete_tool, audio_tool, audio_capture_start_tool, audio_capture_stop_tool, expand_ref_tool],
+        before_model_callback=_filter_tools_by_relevance,
+        before_tool_callback=_snapshot_cache_lookup,
+        after_tool_callback=[_update_snapshot_cache, _detect_stalled_loop, _compact_large_tool_result],
     )
 
     loop_agent = LoopAgent(
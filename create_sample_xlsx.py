@@ -1,40 +1,115 @@
-"""Generate a sample tasks.xlsx for testing."""
-
-from openpyxl import Workbook
-
-wb = Workbook()
-ws = wb.active
-ws.append(["task_id", "url", "instructions"])
-ws.append([
-    "T001",
-    "https://example.com",
-    "Verify the page title says 'Example Domain'. Click the 'More information...' link.",
-])
-ws.append([
-    "T002",
-    "https://httpbin.org/forms/post",
-    (
-        "Fill the form: set 'custname' to 'Test User', 'custtel' to '555-1234', "
-        "select 'medium' pizza size, check 'bacon' topping, and submit the form."
-    ),
-])
-ws.append([
-    "T003",
-    "https://mictests.com/",
-    (
-        "Click the 'Test my mic' button to start the microphone test. "
-        "Wait for the audio visualization to appear (waveform or volume bars moving). "
-        "Verify that the page detects audio input and shows a result like 'Microphone is working'. "
-        "Take a screenshot showing the test result."
-    ),
-])
-ws.append([
-    "T004",
-    "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3",
-    (
-        "Play the audio on this page and capture the audio output. "
-        "Verify audio plays for at least 3 seconds."
-    ),
-])
-wb.save("tasks.xlsx")
-print("Created tasks.xlsx with 4 sample tasks.")
+"""Generate a sample tasks.xlsx for testing.
+
+Writes the XLSX ZIP container directly with stdlib zipfile instead of
+openpyxl: for a tiny, schema-fixed sheet the library's import cost alone
+dwarfs the actual work, and this script has no other reason to pull it in.
+"""
+
+import zipfile
+from xml.sax.saxutils import escape
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>
+</Relationships>"""
+
+
+def write_minimal_xlsx(path: str, rows: list[list[str]]) -> None:
+    """Write an all-string worksheet as a minimal XLSX, no openpyxl needed."""
+    # Shared-strings table: each distinct cell value stored once, cells
+    # reference it by index (the format's required layout for strings).
+    strings: dict[str, int] = {}
+    row_xml = []
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, value in enumerate(row):
+            idx = strings.setdefault(value, len(strings))
+            ref = f"{chr(ord('A') + c)}{r}"
+            cells.append(f'<c r="{ref}" t="s"><v>{idx}</v></c>')
+        row_xml.append(f'<row r="{r}">{"".join(cells)}</row>')
+
+    # The dimension element is technically optional but read_only openpyxl
+    # (as used by excel_io.read_tasks) expects a sized sheet.
+    n_cols = max((len(row) for row in rows), default=1)
+    dimension = f"A1:{chr(ord('A') + n_cols - 1)}{max(len(rows), 1)}"
+    sheet = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<dimension ref="{dimension}"/>'
+        f'<sheetData>{"".join(row_xml)}</sheetData></worksheet>'
+    )
+    shared = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        f' count="{len(strings)}" uniqueCount="{len(strings)}">'
+        + "".join(f"<si><t>{escape(s)}</t></si>" for s in strings)
+        + "</sst>"
+    )
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        z.writestr("_rels/.rels", _ROOT_RELS)
+        z.writestr("xl/workbook.xml", _WORKBOOK)
+        z.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        z.writestr("xl/worksheets/sheet1.xml", sheet)
+        z.writestr("xl/sharedStrings.xml", shared)
+
+
+SAMPLE_ROWS = [
+    ["task_id", "url", "instructions"],
+    [
+        "T001",
+        "https://example.com",
+        "Verify the page title says 'Example Domain'. Click the 'More information...' link.",
+    ],
+    [
+        "T002",
+        "https://httpbin.org/forms/post",
+        (
+            "Fill the form: set 'custname' to 'Test User', 'custtel' to '555-1234', "
+            "select 'medium' pizza size, check 'bacon' topping, and submit the form."
+        ),
+    ],
+    [
+        "T003",
+        "https://mictests.com/",
+        (
+            "Click the 'Test my mic' button to start the microphone test. "
+            "Wait for the audio visualization to appear (waveform or volume bars moving). "
+            "Verify that the page detects audio input and shows a result like 'Microphone is working'. "
+            "Take a screenshot showing the test result."
+        ),
+    ],
+    [
+        "T004",
+        "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3",
+        (
+            "Play the audio on this page and capture the audio output. "
+            "Verify audio plays for at least 3 seconds."
+        ),
+    ],
+]
+
+if __name__ == "__main__":
+    write_minimal_xlsx("tasks.xlsx", SAMPLE_ROWS)
+    print(f"Created tasks.xlsx with {len(SAMPLE_ROWS) - 1} sample tasks.")
@@ -0,0 +1,139 @@
+# db.py
+"""SQLite-backed task queue, an alternative to the tasks.xlsx front end.
+
+tasks.xlsx is a whole-file-rewrite format: every status update re-parses and
+re-serializes the full ZIP/XML. A SQLite database in WAL mode gives O(1) row
+updates and safe concurrent writers. The orchestrator uses tasks.db when it
+exists (see TASKS_DB) and falls back to the spreadsheet otherwise;
+import_xlsx_to_sqlite migrates an existing sheet, and export_to_xlsx writes a
+spreadsheet snapshot for humans.
+"""
+
+import sqlite3
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+from excel_io import RESULT_COLUMNS, Task
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    url TEXT,
+    instructions TEXT,
+    status TEXT,
+    screenshot_link TEXT,
+    error TEXT,
+    explanation TEXT,
+    audio_link TEXT
+)
+"""
+
+
+def open_db(path: str | Path) -> sqlite3.Connection:
+    """Open (creating if needed) the task database with WAL mode enabled."""
+    # check_same_thread=False: the orchestrator writes from its single-thread
+    # writer executor while opening/closing on the main thread; that executor
+    # already guarantees one writer at a time.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(_SCHEMA)
+    conn.commit()
+    return conn
+
+
+def read_pending_tasks(conn: sqlite3.Connection) -> list[Task]:
+    """Read tasks not yet marked success, mirroring excel_io.read_tasks."""
+    rows = conn.execute(
+        "SELECT task_id, url, instructions FROM tasks"
+        " WHERE status IS NULL OR status != 'success'"
+    ).fetchall()
+    return [
+        Task(task_id=str(r[0]), url=str(r[1] or ""), instructions=str(r[2] or ""))
+        for r in rows
+        if r[0] is not None
+    ]
+
+
+def update_task_result(
+    conn: sqlite3.Connection,
+    task_id: str,
+    screenshot_link: str,
+    status: str,
+    error: str,
+    explanation: str = "",
+    audio_link: str = "",
+) -> None:
+    """Write one task's results as a single UPDATE."""
+    cur = conn.execute(
+        "UPDATE tasks SET screenshot_link=?, status=?, error=?, explanation=?,"
+        " audio_link=? WHERE task_id=?",
+        (screenshot_link, status, error, explanation, audio_link or "", task_id),
+    )
+    if cur.rowcount == 0:
+        raise ValueError(f"Task ID '{task_id}' not found in task database")
+    conn.commit()
+
+
+def import_xlsx_to_sqlite(xlsx_path: str | Path, db_path: str | Path) -> int:
+    """One-time migration of a tasks.xlsx sheet into the SQLite queue.
+
+    Returns the number of imported rows. Existing task_ids are left untouched.
+    """
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        headers = list(header_row) if header_row else []
+        col_idx = {name: i for i, name in enumerate(headers)}
+        if "task_id" not in col_idx:
+            raise ValueError(f"Missing task_id column in {xlsx_path}")
+
+        def _get(row, name):
+            i = col_idx.get(name)
+            if i is None or i >= len(row) or row[i] is None:
+                return ""
+            return str(row[i])
+
+        conn = open_db(db_path)
+        try:
+            imported = 0
+            for row in rows:
+                if col_idx["task_id"] >= len(row) or row[col_idx["task_id"]] is None:
+                    continue
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO tasks"
+                    " (task_id, url, instructions, status, screenshot_link,"
+                    "  error, explanation, audio_link)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        str(row[col_idx["task_id"]]),
+                        _get(row, "url"),
+                        _get(row, "instructions"),
+                        _get(row, "status") or None,
+                        _get(row, "screenshot_link"),
+                        _get(row, "error"),
+                        _get(row, "explanation"),
+                        _get(row, "audio_link"),
+                    ),
+                )
+                imported += cur.rowcount
+            conn.commit()
+            return imported
+        finally:
+            conn.close()
+    finally:
+        wb.close()
+
+
+def export_to_xlsx(conn: sqlite3.Connection, xlsx_path: str | Path) -> None:
+    """Write a human-readable spreadsheet snapshot of the task database."""
+    wb = Workbook()
+    ws = wb.active
+    columns = ("task_id", "url", "instructions", *RESULT_COLUMNS)
+    ws.append(columns)
+    for row in conn.execute(f"SELECT {', '.join(columns)} FROM tasks"):
+        ws.append(row)
+    wb.save(xlsx_path)
@@ -1,9 +1,10 @@
 # excel_io.py
 """Read and write task data from/to Excel files."""
 
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
 
 
 @dataclass(frozen=True)
@@ -14,33 +15,226 @@ class Task:
 
 
 def read_tasks(path: str | Path) -> list[Task]:
-    """Read tasks from Excel, skipping rows where status is 'success'."""
+    """Read tasks from Excel, skipping rows where status is 'success'.
+
+    Opens the workbook in read-only/data-only mode: the default loader builds
+    a full in-memory cell graph (styles, formulas, ~50x the file size), while
+    read-only mode streams rows at roughly constant memory.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # Some writers emit broken dimensions ("A1:A1"); recompute from data.
+        if ws.calculate_dimension() == "A1:A1":
+            ws.reset_dimensions()
+
+        rows = ws.iter_rows(values_only=True)
+        # Sentinel-based empty check: in read-only mode max_row is not
+        # reliable, but an exhausted iterator is. A sheet with no header row
+        # has no tasks either.
+        header_row = next(rows, None)
+        if header_row is None:
+            return []
+        headers = list(header_row)
+
+        # Single dict build instead of repeated O(n) headers.index scans; also
+        # makes duplicate header names resolve consistently (last one wins).
+        col_idx = {name: i for i, name in enumerate(headers)}
+
+        required = ("task_id", "url", "instructions")
+        missing = [c for c in required if c not in col_idx]
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {missing}")
+
+        task_id_col = col_idx["task_id"]
+        url_col = col_idx["url"]
+        instructions_col = col_idx["instructions"]
+        status_col = col_idx.get("status")
+
+        tasks = []
+        for row in rows:
+            # Read-only rows can be shorter than the header when trailing
+            # cells are empty; pad so column indexing stays valid.
+            if len(row) < len(headers):
+                row = row + (None,) * (len(headers) - len(row))
+            if row[task_id_col] is None:
+                continue
+            if status_col is not None and row[status_col] == "success":
+                continue
+            tasks.append(Task(
+                task_id=str(row[task_id_col]),
+                url=str(row[url_col] or ""),
+                instructions=str(row[instructions_col] or ""),
+            ))
+        return tasks
+    finally:
+        # Read-only mode keeps the file handle open until closed.
+        wb.close()
+
+
+# Columns appended to the sheet to hold per-task results.
+RESULT_COLUMNS = ("screenshot_link", "status", "error", "explanation", "audio_link")
+
+
+def open_results_workbook(path: str | Path):
+    """Load the workbook once for a whole run and prepare it for result writes.
+
+    Reloading and re-saving the workbook per task costs a full XML parse and
+    re-serialization each time (O(tasks x workbook size)). Open it once,
+    ensure the result columns exist, and index task_id -> row number so each
+    update is a direct cell write; save once when the run finishes.
+
+    Returns:
+        (wb, col_idx, row_idx) where col_idx maps header name to 1-based
+        column and row_idx maps task_id to row number.
+    """
     wb = load_workbook(path)
     ws = wb.active
     headers = [cell.value for cell in ws[1]]
+    for col_name in RESULT_COLUMNS:
+        if col_name not in headers:
+            headers.append(col_name)
+            ws.cell(row=1, column=len(headers), value=col_name)
+
+    col_idx = {name: i + 1 for i, name in enumerate(headers)}
+    task_col = col_idx["task_id"] - 1
+    row_idx = {}
+    for row in ws.iter_rows(min_row=2):
+        value = row[task_col].value
+        if value is not None:
+            row_idx[str(value)] = row[0].row
+    return wb, col_idx, row_idx
+
+
+def update_task_result_in_ws(
+    ws,
+    col_idx: dict[str, int],
+    row_idx: dict[str, int],
+    task_id: str,
+    screenshot_link: str,
+    status: str,
+    error: str,
+    explanation: str = "",
+    audio_link: str = "",
+) -> None:
+    """Write one task's results into an already-loaded worksheet.
+
+    Companion to open_results_workbook; the caller saves the workbook.
+    """
+    if task_id not in row_idx:
+        raise ValueError(f"Task ID '{task_id}' not found in worksheet")
+    row = row_idx[task_id]
+    ws.cell(row=row, column=col_idx["screenshot_link"], value=screenshot_link)
+    ws.cell(row=row, column=col_idx["status"], value=status)
+    ws.cell(row=row, column=col_idx["error"], value=error)
+    ws.cell(row=row, column=col_idx["explanation"], value=explanation)
+    ws.cell(row=row, column=col_idx["audio_link"], value=audio_link or "")
+
+
+# Above this many data rows, update_task_results_bulk streams a fresh file
+# instead of loading the full cell graph.
+STREAM_REWRITE_THRESHOLD = 1000
+
+
+def update_task_results_bulk(path: str | Path, updates: list[dict]) -> None:
+    """Write many tasks' results in one load/save cycle.
+
+    Each update dict needs task_id, screenshot_link, status and error keys;
+    explanation and audio_link are optional. One workbook parse and one
+    serialization regardless of how many rows change, versus O(tasks) full
+    rewrites when calling update_task_result per task.
+
+    Big sheets take the streaming path: rows are read in read-only mode,
+    patched as plain tuples, and written to a new file with a write_only
+    workbook (which skips openpyxl's in-memory cell graph entirely), then
+    atomically swapped in with os.replace. Sheet names, order and all other
+    sheets' rows are carried over, but the streaming rewrite keeps computed
+    values only: formulas and formatting anywhere in the workbook are
+    flattened. Keep result workbooks plain data if they can grow past the
+    threshold.
+    """
+    if not updates:
+        return
+    path = Path(path)
+    if _sheet_row_count(path) > STREAM_REWRITE_THRESHOLD:
+        _stream_rewrite(path, updates)
+        return
+    wb, col_idx, row_idx = open_results_workbook(path)
+    ws = wb.active
+    for u in updates:
+        update_task_result_in_ws(
+            ws,
+            col_idx,
+            row_idx,
+            u["task_id"],
+            u["screenshot_link"],
+            u["status"],
+            u["error"],
+            explanation=u.get("explanation", ""),
+            audio_link=u.get("audio_link", ""),
+        )
+    wb.save(path)
 
-    required = ("task_id", "url", "instructions")
-    missing = [c for c in required if c not in headers]
+
+def _sheet_row_count(path: Path) -> int:
+    """Cheap row count via read-only mode (no cell graph built)."""
+    wb = load_workbook(path, read_only=True)
+    try:
+        return wb.active.max_row or 0
+    finally:
+        wb.close()
+
+
+def _stream_rewrite(path: Path, updates: list[dict]) -> None:
+    """Rewrite the workbook through a write_only workbook, values only.
+
+    The task sheet (the active one) gets the result rows patched in; every
+    other sheet is copied row by row under its original name and position.
+    Formulas and formatting do not survive: read-only mode yields computed
+    values and write_only emits plain cells.
+    """
+    by_id = {u["task_id"]: u for u in updates}
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        task_sheet = wb.active.title
+        out = Workbook(write_only=True)
+        seen = set()
+        for ws in wb.worksheets:
+            out_ws = out.create_sheet(title=ws.title)
+            rows = ws.iter_rows(values_only=True)
+            if ws.title != task_sheet:
+                for row in rows:
+                    out_ws.append(row)
+                continue
+
+            header_row = next(rows, None)
+            headers = list(header_row) if header_row else []
+            for col_name in RESULT_COLUMNS:
+                if col_name not in headers:
+                    headers.append(col_name)
+            col_idx = {name: i for i, name in enumerate(headers)}
+            task_col = col_idx["task_id"]
+            out_ws.append(headers)
+            for row in rows:
+                row = list(row) + [None] * (len(headers) - len(row))
+                u = by_id.get(str(row[task_col])) if row[task_col] is not None else None
+                if u is not None:
+                    seen.add(u["task_id"])
+                    row[col_idx["screenshot_link"]] = u["screenshot_link"]
+                    row[col_idx["status"]] = u["status"]
+                    row[col_idx["error"]] = u["error"]
+                    row[col_idx["explanation"]] = u.get("explanation", "")
+                    row[col_idx["audio_link"]] = u.get("audio_link", "")
+                out_ws.append(row)
+    finally:
+        wb.close()
+
+    missing = set(by_id) - seen
     if missing:
-        raise ValueError(f"Missing required columns in {path}: {missing}")
-
-    task_id_col = headers.index("task_id")
-    url_col = headers.index("url")
-    instructions_col = headers.index("instructions")
-    status_col = headers.index("status") if "status" in headers else None
-
-    tasks = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if row[task_id_col] is None:
-            continue
-        if status_col is not None and row[status_col] == "success":
-            continue
-        tasks.append(Task(
-            task_id=str(row[task_id_col]),
-            url=str(row[url_col] or ""),
-            instructions=str(row[instructions_col] or ""),
-        ))
-    return tasks
+        raise ValueError(f"Task IDs not found in {path}: {sorted(missing)}")
+    tmp = path.with_name(f".{path.name}.tmp")
+    out.save(tmp)
+    os.replace(tmp, path)
 
 
 def update_task_result(
@@ -55,28 +249,41 @@ def update_task_result(
     """Write task results back to the Excel file."""
     wb = load_workbook(path)
     ws = wb.active
-    headers = [cell.value for cell in ws[1]]
+    # Header-only (or empty) sheet: the task cannot exist, skip the row scan.
+    if ws.max_row is None or ws.max_row < 2:
+        raise ValueError(f"Task ID '{task_id}' not found in {path}")
+    col_idx = {cell.value: i for i, cell in enumerate(ws[1], start=1)}  # 1-indexed
 
-    # Add result columns if missing
-    for col_name in ("screenshot_link", "status", "error", "explanation", "audio_link"):
-        if col_name not in headers:
-            headers.append(col_name)
-            ws.cell(row=1, column=len(headers), value=col_name)
+    # Add result columns if missing, extending the index in place
+    for col_name in RESULT_COLUMNS:
+        if col_name not in col_idx:
+            col_idx[col_name] = len(col_idx) + 1
+            ws.cell(row=1, column=col_idx[col_name], value=col_name)
 
-    task_id_col = headers.index("task_id")
-    ss_col = headers.index("screenshot_link") + 1  # openpyxl is 1-indexed
-    status_col = headers.index("status") + 1
-    error_col = headers.index("error") + 1
-    explanation_col = headers.index("explanation") + 1
-    audio_col = headers.index("audio_link") + 1
+    task_id_col = col_idx["task_id"] - 1
+    ss_col = col_idx["screenshot_link"]
+    status_col = col_idx["status"]
+    error_col = col_idx["error"]
+    explanation_col = col_idx["explanation"]
+    audio_col = col_idx["audio_link"]
 
     for row in ws.iter_rows(min_row=2):
         if str(row[task_id_col].value) == task_id:
-            ws.cell(row=row[0].row, column=ss_col, value=screenshot_link)
-            ws.cell(row=row[0].row, column=status_col, value=status)
-            ws.cell(row=row[0].row, column=error_col, value=error)
-            ws.cell(row=row[0].row, column=explanation_col, value=explanation)
-            ws.cell(row=row[0].row, column=audio_col, value=audio_link or "")
+            # row already holds the Cell objects, so assign through the tuple
+            # instead of five ws.cell() lookups. Freshly appended result
+            # columns are not in the tuple yet; fall back to ws.cell for them.
+            values = (
+                (ss_col, screenshot_link),
+                (status_col, status),
+                (error_col, error),
+                (explanation_col, explanation),
+                (audio_col, audio_link or ""),
+            )
+            for col, value in values:
+                if col <= len(row):
+                    row[col - 1].value = value
+                else:
+                    ws.cell(row=row[0].row, column=col, value=value)
             break
     else:
         raise ValueError(f"Task ID '{task_id}' not found in {path}")
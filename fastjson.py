@@ -0,0 +1,23 @@
+# fastjson.py
+"""JSON serialization helpers backed by orjson when available.
+
+orjson is 2-10x faster than stdlib json on the dict-heavy payloads this
+project serializes per event (Playwright MCP tool args for loop-detection
+hashing, plan-cache entries). Falls back to stdlib json transparently so the
+dependency stays soft.
+"""
+
+try:
+    import orjson
+
+    def dumps_bytes(obj, sort_keys: bool = False) -> bytes:
+        """Serialize obj to JSON bytes; non-JSON types fall back to str()."""
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, option=option, default=str)
+
+except ImportError:
+    import json
+
+    def dumps_bytes(obj, sort_keys: bool = False) -> bytes:
+        """Serialize obj to JSON bytes; non-JSON types fall back to str()."""
+        return json.dumps(obj, sort_keys=sort_keys, default=str).encode()
@@ -2,14 +2,18 @@
 """Orchestrator: reads tasks from Excel, runs agent per task, saves results."""
 
 import asyncio
+import base64
+import concurrent.futures
+import functools
+import hashlib
+import http.client
+import json
 import logging
 import os
 import shutil
 import subprocess
 import sys
 import time
-import urllib.request
-from datetime import datetime, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -18,14 +22,20 @@ from google.adk.apps.app import App, ResumabilityConfig
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
 from google.genai import types
 
-from agent import build_agent
-from excel_io import read_tasks, update_task_result
+import db as task_db
+import plan_cache
+from fastjson import dumps_bytes
+from agent import build_agent, warm_toolsets
+from excel_io import open_results_workbook, read_tasks, update_task_result_in_ws
 
 load_dotenv()
 
+# %(relativeCreated)d (ms since startup) is a plain attribute read, while
+# %(asctime)s runs strftime for every record -- measurable across the
+# thousands of events a long run logs.
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
+    format="%(relativeCreated)8d [%(levelname)s] %(message)s",
 )
 log = logging.getLogger(__name__)
 
@@ -41,26 +51,140 @@ def resolve_model_string() -> str:
 
 PICS_DIR = Path("pics")
 AUDIO_DIR = Path("audio")
+# Append-only per-task crash log: the workbook is only saved once at the end
+# of the run, so this is what survives if the process dies mid-run.
+RESULTS_LOG = Path("tasks_results.jsonl")
 APP_NAME = "tester_agent"
 CDP_PORT = 9222
 CDP_ENDPOINT = f"http://localhost:{CDP_PORT}"
 
 
-def launch_chrome(port: int) -> subprocess.Popen:
-    """Launch Chrome with remote debugging enabled."""
-    # Try common Chrome paths on Windows
-    chrome_paths = [
-        os.environ.get("CHROME_PATH", ""),
+_CHROME_PATH_CACHE = Path.home() / ".tester-agent" / "chrome.path"
+_USER_DATA_DIR = str(Path.home() / ".tester-agent-chrome-profile")
+
+# Common Chrome install locations on Windows, resolved once at import
+# (expandvars does an env lookup per call).
+_CHROME_CANDIDATES: tuple[str, ...] = tuple(
+    p
+    for p in (
         r"C:\Program Files\Google\Chrome\Application\chrome.exe",
         r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
         os.path.expandvars(r"%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe"),
-    ]
-    chrome_exe = None
-    for p in chrome_paths:
-        if p and os.path.isfile(p):
-            chrome_exe = p
-            break
+    )
+    if p
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _locate_chrome() -> str | None:
+    """Find the Chrome executable, caching the result across runs.
+
+    CHROME_PATH always wins; otherwise the path cached by a previous run is
+    tried (and invalidated if Chrome moved), and only then the candidate
+    paths are probed. Saves the per-startup stat calls on the common path.
+    lru_cache memoizes within the process so repeated launches (per-task
+    browser contexts) stat nothing, and the hit is exported back into
+    CHROME_PATH so subprocess children skip discovery too.
+    """
+    env_path = os.environ.get("CHROME_PATH", "")
+    if env_path and os.path.isfile(env_path):
+        return env_path
+
+    try:
+        cached = _CHROME_PATH_CACHE.read_text(encoding="utf-8").strip()
+    except OSError:
+        cached = ""
+    if cached and os.path.isfile(cached):
+        os.environ["CHROME_PATH"] = cached
+        return cached
+
+    for p in _CHROME_CANDIDATES:
+        if os.path.isfile(p):
+            try:
+                _CHROME_PATH_CACHE.parent.mkdir(exist_ok=True)
+                _CHROME_PATH_CACHE.write_text(p, encoding="utf-8")
+            except OSError:
+                pass
+            os.environ["CHROME_PATH"] = p
+            return p
+    return None
+
+
+def _confirm_cdp(port: int) -> bool:
+    """One GET against /json/version to confirm the CDP endpoint answers.
+
+    http.client against the literal loopback address skips urllib's URL
+    parsing and the localhost name resolution urlopen redoes per attempt.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+    try:
+        conn.request("GET", "/json/version")
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status == 200
+    except OSError:
+        return False
+    finally:
+        conn.close()
+
+
+# Strong references to fire-and-forget tasks (the loop only keeps weak ones).
+_BACKGROUND_TASKS: set = set()
+
+
+def _spawn_background(coro) -> None:
+    """Run a coroutine in the background, keeping a reference until done."""
+    task = asyncio.create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+
+async def _read_until_banner(stream: asyncio.StreamReader) -> bool:
+    """Read Chrome's stderr until the DevTools-listening banner (or EOF)."""
+    async for line in stream:
+        if b"DevTools listening" in line:
+            return True
+    return False
+
+
+async def _drain_stream(stream: asyncio.StreamReader) -> None:
+    """Discard a subprocess stream so the child never blocks on a full pipe."""
+    while await stream.read(65536):
+        pass
+
+
+async def _port_open(port: int, timeout: float) -> bool:
+    """Probe a local TCP port without blocking the event loop."""
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection("127.0.0.1", port), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
 
+async def launch_chrome(port: int) -> asyncio.subprocess.Process | None:
+    """Launch Chrome with remote debugging enabled.
+
+    Async so the caller can overlap Chrome warmup with the rest of startup
+    (agent build, workbook load) via create_task; the readiness wait uses
+    asyncio primitives instead of blocking sleeps.
+
+    If something is already listening on the CDP port (e.g. a long-lived
+    Chrome left running between dev iterations, with warm caches and
+    cookies), reuse it and return None; the caller must then skip teardown.
+    """
+    if await _port_open(port, timeout=0.2):
+        log.info("Reusing existing CDP endpoint on port %d", port)
+        return None
+
+    chrome_exe = _locate_chrome()
     if not chrome_exe:
         log.error("Chrome not found. Set CHROME_PATH environment variable.")
         sys.exit(1)
@@ -77,30 +201,60 @@ def launch_chrome(port: int) -> subprocess.Popen:
         log.info("Using fake audio file: %s", fake_audio_path)
 
     log.info("Launching Chrome with --remote-debugging-port=%d", port)
-    proc = subprocess.Popen(
-        [
-            chrome_exe,
-            f"--remote-debugging-port={port}",
-            "--no-first-run",
-            "--no-default-browser-check",
-            "--user-data-dir=" + str(Path.home() / ".tester-agent-chrome-profile"),
-            *fake_media_flags,
-        ],
+    proc = await asyncio.create_subprocess_exec(
+        chrome_exe,
+        f"--remote-debugging-port={port}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--user-data-dir=" + _USER_DATA_DIR,
+        *fake_media_flags,
         stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
     )
 
-    # Poll CDP endpoint until Chrome is ready
-    for attempt in range(15):
-        if proc.poll() is not None:
+    deadline = time.monotonic() + 15.0
+
+    # Event-driven readiness: Chrome prints "DevTools listening on ws://..."
+    # to stderr the moment CDP is up, so wait on that banner (or early exit)
+    # instead of sleeping between probes. The probe loop below remains as a
+    # fallback for Chrome builds that word the banner differently.
+    banner_task = asyncio.create_task(_read_until_banner(proc.stderr))
+    exit_task = asyncio.create_task(proc.wait())
+    done, _ = await asyncio.wait(
+        {banner_task, exit_task},
+        timeout=max(deadline - time.monotonic(), 0),
+        return_when=asyncio.FIRST_COMPLETED,
+    )
+    if exit_task in done:
+        banner_task.cancel()
+        log.error("Chrome exited with code %d", proc.returncode)
+        sys.exit(1)
+    exit_task.cancel()
+    if banner_task in done and banner_task.result():
+        log.info("Chrome DevTools banner seen; confirming endpoint.")
+    else:
+        banner_task.cancel()
+    # Keep draining stderr so Chrome never blocks on a full pipe.
+    _spawn_background(_drain_stream(proc.stderr))
+
+    # Confirm via TCP probe + /json/version; after the banner this succeeds
+    # on the first pass, otherwise it backs off until the deadline.
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if proc.returncode is not None:
             log.error("Chrome exited with code %d", proc.returncode)
             sys.exit(1)
-        try:
-            urllib.request.urlopen(f"http://localhost:{port}/json/version", timeout=2)
-            log.info("Chrome CDP endpoint ready on port %d", port)
-            return proc
-        except Exception:
-            time.sleep(1)
+        if not await _port_open(port, timeout=0.5):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            continue
+        # Port is accepting; confirm the CDP endpoint actually answers.
+        if not await asyncio.to_thread(_confirm_cdp, port):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            continue
+        log.info("Chrome CDP endpoint ready on port %d", port)
+        return proc
 
     log.error("Chrome did not become ready on port %d after 15 seconds", port)
     proc.terminate()
@@ -111,70 +265,236 @@ PROJECT_DIR = Path(__file__).resolve().parent
 
 
 def snapshot_png_files() -> dict[Path, float]:
-    """Return a dict of .png files -> mtime currently in the project directory."""
-    return {p: p.stat().st_mtime for p in PROJECT_DIR.glob("*.png")}
-
-
-def collect_screenshots(task_id: str, before: dict[Path, float]) -> str:
-    """Move new or modified .png files from project root to pics/, return comma-separated paths."""
+    """Return a dict of .png files -> mtime currently in the project directory.
+
+    One os.scandir pass: DirEntry serves is_file and stat from the directory
+    read itself, instead of glob's listing plus a stat syscall per match.
+    No longer on the hot path (collection is prefix-based now); retained for
+    compatibility and ad-hoc debugging.
+    """
+    out = {}
+    with os.scandir(PROJECT_DIR) as it:
+        for e in it:
+            if e.name.endswith(".png") and e.is_file(follow_symlinks=False):
+                out[Path(e.path)] = e.stat().st_mtime
+    return out
+
+
+def collect_screenshots(task_id: str) -> str:
+    """Move this task's .png files from project root to pics/, return comma-separated paths.
+
+    The agent is instructed to name screenshots with a '{task_id}_' prefix
+    (see format_task_prompt), so ownership is established by filename rather
+    than a before/after mtime diff of the whole directory. That removes two
+    O(files) scans per task and makes collection safe under concurrency:
+    parallel tasks can no longer claim each other's files.
+    """
     PICS_DIR.mkdir(exist_ok=True)
-    after = snapshot_png_files()
-
-    changed = []
-    for p, mtime in after.items():
-        if p not in before or mtime > before[p]:
-            changed.append(p)
+    prefix = f"{task_id}_"
+    with os.scandir(PROJECT_DIR) as it:
+        changed = [
+            Path(e.path)
+            for e in it
+            if e.name.startswith(prefix) and e.name.endswith(".png")
+        ]
 
     if not changed:
         log.warning("No new screenshot files found for task %s", task_id)
         return ""
 
     saved = []
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    for i, src in enumerate(sorted(changed)):
-        suffix = f"_{i}" if len(changed) > 1 else ""
-        dest_name = f"{task_id}_{timestamp}{suffix}.png"
-        dest = PICS_DIR / dest_name
-        shutil.move(str(src), str(dest))
+    # time_ns is unique per call and far cheaper than strftime; filenames
+    # keep the {task_id}_{timestamp} shape, just with a numeric timestamp.
+    # Sorting on the name string avoids Path's segment-wise comparison, and
+    # os.replace is a single rename syscall where shutil.move stats the
+    # destination and considers a cross-device copy (pics/ shares the
+    # project volume).
+    for src in sorted(changed, key=lambda p: p.name):
+        dest = PICS_DIR / f"{task_id}_{time.time_ns()}.png"
+        os.replace(src, dest)
         log.info("Screenshot moved: %s -> %s", src.name, dest)
         saved.append(str(dest))
 
     return ", ".join(saved)
 
 
+# Base64 decode chunk size for audio: 64 KiB of input, kept a multiple of 4
+# so each slice is independently decodable.
+_B64_CHUNK = 64 * 1024
+
+# Upper bound for direct WAV uploads from the page (refuse anything bigger).
+_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+
+async def _start_audio_upload_server() -> tuple[asyncio.AbstractServer, int]:
+    """Local HTTP endpoint the stop_audio_capture JS POSTs WAV bytes to.
+
+    Lets the page ship the recording as raw bytes instead of a base64 string
+    through the tool channel (~33% more bytes plus an encode and a decode
+    pass). Loopback only; filenames are restricted to a bare *.wav basename
+    under audio/.
+    """
+
+    async def _handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1", "replace").split()
+            if len(parts) < 2:
+                return
+            method, target = parts[0], parts[1]
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            name = os.path.basename(target.rsplit("/", 1)[-1])
+            ok = False
+            if (
+                method == "POST"
+                and name.endswith(".wav")
+                and 0 < length <= _MAX_UPLOAD_BYTES
+            ):
+                AUDIO_DIR.mkdir(exist_ok=True)
+                remaining = length
+                with open(AUDIO_DIR / name, "wb") as f:
+                    while remaining:
+                        chunk = await reader.read(min(65536, remaining))
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                ok = remaining == 0
+            status = b"200 OK" if ok or method == "OPTIONS" else b"400 Bad Request"
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\n"
+                b"Access-Control-Allow-Origin: *\r\n"
+                b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+            )
+            await writer.drain()
+        except Exception:
+            log.debug("Audio upload handler error", exc_info=True)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, port
+
+
 def collect_audio(task_id: str, b64_wav: str | None) -> str:
-    """Decode a base64 WAV string and save to audio/ directory. Returns saved path or empty string."""
+    """Decode a base64 WAV string and save to audio/ directory. Returns saved path or empty string.
+
+    Decodes in chunks straight to the file descriptor instead of
+    materializing the whole WAV as one bytes object, so peak memory stays at
+    one chunk rather than input + decoded output for multi-MB recordings.
+    """
     if not b64_wav:
         return ""
 
-    import base64
-
     AUDIO_DIR.mkdir(exist_ok=True)
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    dest = AUDIO_DIR / f"{task_id}_{timestamp}.wav"
+    dest = AUDIO_DIR / f"{task_id}_{time.time_ns()}.wav"
+
+    # Direct upload path: the page already POSTed the raw WAV bytes to the
+    # local endpoint, so there is nothing to decode -- just claim the file.
+    if b64_wav.startswith("uploaded:"):
+        name = os.path.basename(b64_wav[len("uploaded:"):])
+        src = AUDIO_DIR / name
+        if not src.is_file():
+            log.warning("Task %s: uploaded audio file %s not found", task_id, name)
+            return ""
+        os.replace(src, dest)
+        log.info("Audio saved: %s (%d bytes)", dest, dest.stat().st_size)
+        return str(dest)
 
     try:
-        wav_bytes = base64.b64decode(b64_wav)
-        dest.write_bytes(wav_bytes)
-        log.info("Audio saved: %s (%d bytes)", dest, len(wav_bytes))
+        view = memoryview(b64_wav.encode("ascii"))
+        total = 0
+        fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            for i in range(0, len(view), _B64_CHUNK):
+                total += os.write(fd, base64.b64decode(view[i : i + _B64_CHUNK]))
+        finally:
+            os.close(fd)
+        log.info("Audio saved: %s (%d bytes)", dest, total)
         return str(dest)
     except Exception as e:
         log.warning("Failed to save audio for task %s: %s", task_id, e)
         return ""
 
 
+# Loop detection: a task is declared stuck when the same (tool, args) call
+# recurs this many times in a row. Consecutive-only on purpose: the normal
+# act -> snapshot -> act rhythm revisits the same calls non-consecutively all
+# the time, and the orchestrator cannot see tool outputs to tell a stale page
+# from a changed one (agent.py's detector, which can, handles that case).
+LOOP_THRESHOLD = 3
+
+# Tools exempt from loop detection here: snapshots and screenshots take no
+# args (their hash is constant) and are the model's routine sensors, and
+# repeating a wait or key press verbatim is normal interaction. Mirrors
+# agent.py's _STALL_EXEMPT_TOOLS.
+_LOOP_EXEMPT_TOOLS = frozenset(
+    {
+        "browser_snapshot",
+        "take_screenshot",
+        "browser_wait_for",
+        "browser_wait",
+        "browser_press_key",
+    }
+)
+
+# Serializes console auth prompts so concurrently paused tasks don't
+# interleave their banners or steal each other's Enter press.
+_AUTH_PROMPT_LOCK = asyncio.Lock()
+
+
+async def _wait_stdin_line() -> str:
+    """Wait for one line on stdin without parking an executor thread.
+
+    loop.add_reader wakes us via the selector when input is ready, costing
+    zero threads per paused task; asyncio.to_thread(input) would pin one
+    default-executor thread for the whole (unbounded) wait, and many paused
+    auth tasks would drain the pool. Falls back to the thread approach on
+    event loops without reader support (Windows Proactor).
+    """
+    loop = asyncio.get_running_loop()
+    fd = sys.stdin.fileno()
+    fut = loop.create_future()
+
+    def _on_ready() -> None:
+        loop.remove_reader(fd)
+        if not fut.done():
+            fut.set_result(sys.stdin.readline())
+
+    try:
+        loop.add_reader(fd, _on_ready)
+    except (NotImplementedError, OSError):
+        return await asyncio.to_thread(sys.stdin.readline)
+    try:
+        return await fut
+    finally:
+        loop.remove_reader(fd)
+
+
+def _action_hash(fc) -> bytes:
+    """Hash a function call's name and arguments into a compact fingerprint."""
+    payload = fc.name.encode() + b"|" + dumps_bytes(fc.args or {}, sort_keys=True)
+    return hashlib.blake2b(payload, digest_size=8).digest()
+
+
 async def run_task(
     runner: Runner,
     task_id: str,
     prompt: str,
-) -> tuple[str, str, str, str]:
-    """Run a single task through the agent. Returns (status, error, explanation, audio_b64)."""
-    session = await runner.session_service.create_session(
-        app_name=APP_NAME,
-        user_id="human",
-        session_id=f"task-{task_id}",
-    )
+    session_id: str,
+) -> tuple[str, str, str, str, list]:
+    """Run a single task through the agent, in a precreated session.
 
+    Returns (status, error, explanation, audio_b64, actions) where actions is
+    the recorded (tool, args) sequence, used to seed the plan cache.
+    """
     status = "failed"
     error = ""
     explanation = ""
@@ -186,36 +506,82 @@ async def run_task(
 
     message = types.Content(role="user", parts=[types.Part(text=prompt)])
 
+    # Consecutive-repeat tracking for loop detection: if the agent replays the
+    # exact same call back to back, bail out instead of paying LLM round-trips
+    # until the LoopAgent iteration ceiling.
+    last_hash = None
+    run_length = 0
+    loop_detected = False
+    actions: list = []
+
     # Outer loop handles auth pause/resume; inner async-for processes agent events
     while True:
         async for event in runner.run_async(
             user_id="human",
-            session_id=session.id,
+            session_id=session_id,
             new_message=message,
         ):
-            # Check for mark_task_complete
+            # One pass over the function responses, dispatching on name --
+            # get_function_responses() rebuilds a filtered list per call, and
+            # this runs for every event in the stream.
             for fr in event.get_function_responses():
-                if fr.name == "mark_task_complete" and fr.response:
+                if not fr.response:
+                    continue
+                if fr.name == "mark_task_complete":
                     status = fr.response.get("status", "failed")
                     explanation = fr.response.get("summary", "")
                     error = explanation if status == "failed" else ""
                     audio_b64 = fr.response.get("audio_data", "")
+                elif fr.response.get("loop_detected"):
+                    # agent.py's _detect_stalled_loop escalated out of the
+                    # LoopAgent by replacing the stalled tool's response, so
+                    # no mark_task_complete follows; keep its summary as the
+                    # error instead of writing the row with an empty one.
+                    status = "failed"
+                    error = fr.response.get("summary", "agent stall detected")
+
+            # Loop detection over the function calls in this event
+            for fc in event.get_function_calls():
+                if fc.name in ("mark_task_complete", "request_human_auth"):
+                    continue
+                actions.append({"tool": fc.name, "args": fc.args or {}})
+                if fc.name in _LOOP_EXEMPT_TOOLS:
+                    continue
+                h = _action_hash(fc)
+                if h == last_hash:
+                    run_length += 1
+                else:
+                    last_hash = h
+                    run_length = 1
+                if run_length >= LOOP_THRESHOLD:
+                    status = "failed"
+                    error = f"loop_detected: '{fc.name}' repeated {LOOP_THRESHOLD}x in a row with identical args"
+                    log.warning("Task %s: %s", task_id, error)
+                    loop_detected = True
+                    break
+            if loop_detected:
+                break
 
             # Check for auth pause (LongRunningFunctionTool)
             if event.long_running_tool_ids:
+                long_running_ids = set(event.long_running_tool_ids)
                 for fc in event.get_function_calls():
-                    if fc.id in event.long_running_tool_ids:
+                    if fc.id in long_running_ids:
                         last_function_call_id = fc.id
                         last_function_call_name = fc.name
                         desc = fc.args.get("description", "Authentication required")
                         log.info("AUTH REQUIRED: %s", desc)
-                        print(f"\n{'='*60}")
-                        print(f"AUTHENTICATION REQUIRED: {desc}")
-                        print("Complete authentication in the browser, then press Enter.")
-                        print(f"{'='*60}")
-                        await asyncio.to_thread(input)
+                        async with _AUTH_PROMPT_LOCK:
+                            print(f"\n{'='*60}")
+                            print(f"AUTHENTICATION REQUIRED [{task_id}]: {desc}")
+                            print("Complete authentication in the browser, then press Enter.")
+                            print(f"{'='*60}")
+                            await _wait_stdin_line()
                 break  # Exit event loop to resume
 
+        if loop_detected:
+            break
+
         # If we paused for auth, resume (with max attempt guard)
         if last_function_call_id:
             auth_attempts += 1
@@ -242,54 +608,145 @@ async def run_task(
         # No pause -- agent finished (or loop exhausted)
         break
 
-    return status, error, explanation, audio_b64
+    return status, error, explanation, audio_b64, actions
 
 
-def format_task_prompt(task) -> str:
-    """Format a Task into a prompt string for the agent."""
-    return (
+# Fixed prompt fragments, built once instead of re-evaluated inside every
+# format_task_prompt call; only the task fields get interpolated per task.
+_PROMPT_TAIL_TMPL = (
+    "Execute these instructions on the web page. "
+    "Take a full-page screenshot when done and save it to a file whose "
+    "name starts with '{task_id}_' (e.g. '{task_id}_result.png'). "
+    "Then call mark_task_complete with the result."
+)
+_CACHED_PLAN_PREFIX = (
+    "\n\nA previous successful run of this exact task used this action"
+    " sequence:\n"
+)
+_CACHED_PLAN_SUFFIX = (
+    "\nFollow it step by step, verifying each action still matches"
+    " the current page, and fall back to normal planning if it"
+    " diverges."
+)
+
+
+def format_task_prompt(task, cached_plan: list | None = None) -> str:
+    """Format a Task into a prompt string for the agent.
+
+    When a cached plan from a previous successful run of the same task is
+    available, append it as a hint: the model can follow the known-good action
+    sequence (verifying each step against the live page) instead of planning
+    from scratch, which cuts exploratory snapshot/LLM turns on repeat runs.
+    """
+    prompt = (
         f"Task ID: {task.task_id}\n"
         f"URL: {task.url}\n"
         f"Instructions: {task.instructions}\n\n"
-        f"Execute these instructions on the web page. "
-        f"Take a full-page screenshot when done. "
-        f"Then call mark_task_complete with the result."
+        + _PROMPT_TAIL_TMPL.format(task_id=task.task_id)
     )
+    if cached_plan:
+        prompt += _CACHED_PLAN_PREFIX + json.dumps(cached_plan) + _CACHED_PLAN_SUFFIX
+    return prompt
 
 
 async def async_main():
+    # Prefer the SQLite queue when present (O(1) row updates, safe concurrent
+    # writers); fall back to the spreadsheet front end otherwise.
+    db_path = Path(os.environ.get("TASKS_DB", "tasks.db"))
     xlsx_path = Path("tasks.xlsx")
-    if not xlsx_path.exists():
-        log.error("tasks.xlsx not found in current directory.")
+    conn = None
+    if db_path.exists():
+        conn = task_db.open_db(db_path)
+        tasks = task_db.read_pending_tasks(conn)
+        log.info("Using SQLite task queue: %s", db_path)
+    elif xlsx_path.exists():
+        tasks = read_tasks(xlsx_path)
+    else:
+        log.error("No task source found: neither %s nor tasks.xlsx exists.", db_path)
         sys.exit(1)
 
-    tasks = read_tasks(xlsx_path)
     if not tasks:
-        log.info("No pending tasks found in tasks.xlsx.")
+        log.info("No pending tasks found.")
+        if conn is not None:
+            conn.close()
         return
 
     log.info("Found %d pending task(s).", len(tasks))
 
-    # Clear pics folder
-    if PICS_DIR.exists():
-        shutil.rmtree(PICS_DIR)
-        log.info("Cleared %s directory.", PICS_DIR)
-    PICS_DIR.mkdir(exist_ok=True)
+    # Start Chrome warmup now and overlap it with the rest of startup
+    # (directory cleanup, workbook load, agent build); awaited below before
+    # the MCP servers need the CDP endpoint.
+    chrome_task = asyncio.create_task(launch_chrome(CDP_PORT))
+
+    # Clear pics/audio folders: rename the old directory aside (one syscall)
+    # and delete it on a background thread, so a run with thousands of stale
+    # files doesn't stall startup behind rmtree.
+    cleanup_tasks = []
+
+    def _clear_dir_lazily(d: Path) -> None:
+        if d.exists():
+            old = d.with_name(f"{d.name}.old-{time.time_ns()}")
+            os.replace(d, old)
+            cleanup_tasks.append(
+                asyncio.create_task(
+                    asyncio.to_thread(shutil.rmtree, old, ignore_errors=True)
+                )
+            )
+            log.info("Cleared %s directory.", d)
+        d.mkdir(exist_ok=True)
+
+    # Everything below chrome_task creation runs inside the try whose finally
+    # owns Chrome teardown: if any setup step raises (a corrupt tasks.xlsx is
+    # enough), the launched Chrome must not be orphaned.
+    chrome_proc = None
+    wb = None
+    upload_server = None
+    try:
+        _clear_dir_lazily(PICS_DIR)
+
+        # collect_screenshots relies on os.replace, which only works within
+        # one filesystem; warn once if pics/ was symlinked or mounted
+        # elsewhere.
+        if os.stat(PROJECT_DIR).st_dev != os.stat(PICS_DIR).st_dev:
+            log.warning(
+                "%s is on a different volume than the project directory; "
+                "screenshot moves will fail (os.replace cannot cross devices).",
+                PICS_DIR,
+            )
 
-    # Clear audio folder
-    if AUDIO_DIR.exists():
-        shutil.rmtree(AUDIO_DIR)
-        log.info("Cleared %s directory.", AUDIO_DIR)
-    AUDIO_DIR.mkdir(exist_ok=True)
+        _clear_dir_lazily(AUDIO_DIR)
 
-    # Launch Chrome
-    chrome_proc = launch_chrome(CDP_PORT)
+        # Fresh crash log per run
+        RESULTS_LOG.unlink(missing_ok=True)
 
-    try:
-        # Build agent and runner
+        # Spreadsheet mode: load the workbook once for the whole run; results
+        # are written into it per task and saved once at the end.
+        if conn is None:
+            wb, col_idx, row_idx = open_results_workbook(xlsx_path)
+            ws = wb.active
+
+        # Local endpoint the in-page audio capture uploads raw WAV bytes to;
+        # stop_audio_capture discovers it via AUDIO_UPLOAD_PORT.
+        upload_server, upload_port = await _start_audio_upload_server()
+        os.environ["AUDIO_UPLOAD_PORT"] = str(upload_port)
+        log.info("Audio upload endpoint on 127.0.0.1:%d", upload_port)
+
+        # Build agent and runner while Chrome is still starting
         model_string = resolve_model_string()
         log.info("Using model: %s", model_string)
-        agent = build_agent(CDP_ENDPOINT, model=model_string)
+        # ISOLATED_BROWSER gives the Playwright MCP one incognito-style
+        # BrowserContext inside the shared Chrome. That isolates the run
+        # from the persistent login profile (cookies, sessions), which is
+        # why it's off by default -- the human-auth flow relies on that
+        # profile. Note it is a single context shared by all tasks, not
+        # per-task isolation: tasks still see each other's state.
+        isolated = os.environ.get("ISOLATED_BROWSER", "").strip().lower() in ("1", "true", "yes")
+        if isolated:
+            log.info("Using an isolated browser context (shared by all tasks).")
+        agent = build_agent(CDP_ENDPOINT, model=model_string, isolated=isolated)
+        chrome_proc = await chrome_task
+        # Initialize both MCP servers in parallel before the first task.
+        await warm_toolsets(CDP_ENDPOINT, isolated=isolated)
         app = App(
             name=APP_NAME,
             root_agent=agent,
@@ -298,28 +755,120 @@ async def async_main():
         session_service = InMemorySessionService()
         runner = Runner(app=app, session_service=session_service)
 
+        # Tasks stay isolated (one session each -- concurrent tasks must not
+        # interleave histories), but the sessions are precreated concurrently
+        # up front instead of one awaited create_session per task inside the
+        # run path. With a persistent backend this batches the round-trips.
+        session_ids = {task.task_id: f"task-{task.task_id}" for task in tasks}
+        await asyncio.gather(
+            *[
+                session_service.create_session(
+                    app_name=APP_NAME, user_id="human", session_id=sid
+                )
+                for sid in session_ids.values()
+            ]
+        )
+
         try:
-            results = []
-            for task in tasks:
-                log.info("--- Task %s: %s ---", task.task_id, task.url)
-                png_before = snapshot_png_files()
-                try:
-                    status, error, explanation, audio_b64 = await run_task(
-                        runner, task.task_id, format_task_prompt(task)
+            # Tasks are I/O-bound (LLM + CDP round-trips) and the fan-out
+            # machinery supports bounded concurrency, but TASK_CONCURRENCY
+            # defaults to 1: every task drives the same browser page through
+            # the one shared Playwright MCP server, so concurrent tasks would
+            # interleave navigation/clicks on each other's pages. Raise it
+            # only once per-task tab/context isolation exists. Screenshot/
+            # audio collection is prefix-scoped per task and needs no lock;
+            # result persistence (crash log, worksheet/SQLite row) runs on a
+            # dedicated single-thread executor, which both keeps the blocking
+            # file I/O off the event loop and guarantees exactly one writer.
+            concurrency = int(os.environ.get("TASK_CONCURRENCY", "1"))
+            if concurrency > 1:
+                log.warning(
+                    "TASK_CONCURRENCY=%d: tasks share one browser page and "
+                    "will interleave actions; use at your own risk until "
+                    "per-task contexts exist.",
+                    concurrency,
+                )
+            sem = asyncio.Semaphore(concurrency)
+            writer = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="xlsx"
+            )
+            loop = asyncio.get_running_loop()
+
+            def _persist_result(record: dict) -> None:
+                with open(RESULTS_LOG, "ab") as f:
+                    f.write(dumps_bytes(record) + b"\n")
+                if conn is not None:
+                    task_db.update_task_result(
+                        conn,
+                        record["task_id"],
+                        record["screenshot_link"],
+                        record["status"],
+                        record["error"],
+                        record["explanation"],
+                        audio_link=record["audio_link"],
+                    )
+                else:
+                    update_task_result_in_ws(
+                        ws,
+                        col_idx,
+                        row_idx,
+                        record["task_id"],
+                        record["screenshot_link"],
+                        record["status"],
+                        record["error"],
+                        record["explanation"],
+                        audio_link=record["audio_link"],
                     )
-                except Exception as e:
-                    log.exception("Task %s failed with exception", task.task_id)
-                    status = "failed"
-                    error = str(e)
-                    explanation = ""
-                    audio_b64 = ""
-
-                screenshot_path = collect_screenshots(task.task_id, png_before)
-                audio_path = collect_audio(task.task_id, audio_b64)
 
-                update_task_result(xlsx_path, task.task_id, screenshot_path, status, error, explanation, audio_link=audio_path)
-                results.append((task.task_id, status, error))
-                log.info("Task %s: %s %s", task.task_id, status, f"({error})" if error else "")
+            async def _run_one(task) -> tuple[str, str, str]:
+                async with sem:
+                    log.info("--- Task %s: %s ---", task.task_id, task.url)
+                    fp = plan_cache.fingerprint(task.url, task.instructions)
+                    cached_plan = plan_cache.get(fp)
+                    if cached_plan:
+                        log.info("Task %s: plan cache hit (%d actions)", task.task_id, len(cached_plan))
+                    try:
+                        status, error, explanation, audio_b64, actions = await run_task(
+                            runner,
+                            task.task_id,
+                            format_task_prompt(task, cached_plan),
+                            session_ids[task.task_id],
+                        )
+                    except Exception as e:
+                        log.exception("Task %s failed with exception", task.task_id)
+                        status = "failed"
+                        error = str(e)
+                        explanation = ""
+                        audio_b64 = ""
+                        actions = []
+
+                    if status == "success" and actions:
+                        plan_cache.put(fp, actions)
+
+                    screenshot_path = collect_screenshots(task.task_id)
+                    audio_path = collect_audio(task.task_id, audio_b64)
+                    record = {
+                        "task_id": task.task_id,
+                        "screenshot_link": screenshot_path,
+                        "status": status,
+                        "error": error,
+                        "explanation": explanation,
+                        "audio_link": audio_path,
+                    }
+                    await loop.run_in_executor(writer, _persist_result, record)
+                    log.info("Task %s: %s %s", task.task_id, status, f"({error})" if error else "")
+                    return task.task_id, status, error
+
+            outcomes = await asyncio.gather(
+                *[_run_one(task) for task in tasks], return_exceptions=True
+            )
+            results = []
+            for task, outcome in zip(tasks, outcomes):
+                if isinstance(outcome, BaseException):
+                    log.error("Task %s crashed: %s", task.task_id, outcome)
+                    results.append((task.task_id, "failed", str(outcome)))
+                else:
+                    results.append(outcome)
 
             # Print summary
             print(f"\n{'='*60}")
@@ -332,21 +881,55 @@ async def async_main():
             passed = sum(1 for _, s, _ in results if s == "success")
             print(f"  {passed}/{len(results)} tasks succeeded.")
         finally:
+            writer.shutdown(wait=True)
             await runner.close()
 
     finally:
-        log.info("Shutting down Chrome...")
-        chrome_proc.terminate()
-        try:
-            chrome_proc.wait(timeout=10)
-        except subprocess.TimeoutExpired:
-            log.warning("Chrome did not exit after terminate(); killing process.")
-            chrome_proc.kill()
-            chrome_proc.wait(timeout=5)
+        if upload_server is not None:
+            upload_server.close()
+            await upload_server.wait_closed()
+        if cleanup_tasks:
+            await asyncio.gather(*cleanup_tasks, return_exceptions=True)
+        if wb is not None:
+            wb.save(xlsx_path)
+            log.info("Results saved to %s", xlsx_path)
+        if conn is not None:
+            conn.close()
+        if chrome_proc is None:
+            # Startup may have failed before the launch task was awaited;
+            # recover its process (or cancel the launch) so Chrome isn't
+            # orphaned.
+            if chrome_task.done() and not chrome_task.cancelled():
+                try:
+                    chrome_proc = chrome_task.result()
+                except BaseException:
+                    chrome_proc = None
+            else:
+                chrome_task.cancel()
+        if chrome_proc is not None:
+            log.info("Shutting down Chrome...")
+            chrome_proc.terminate()
+            try:
+                await asyncio.wait_for(chrome_proc.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                log.warning("Chrome did not exit after terminate(); killing process.")
+                chrome_proc.kill()
+                await asyncio.wait_for(chrome_proc.wait(), timeout=5)
+        else:
+            log.info("Leaving pre-existing Chrome running.")
 
 
 def main():
-    asyncio.run(async_main())
+    # uvloop's libuv-based loop is markedly faster for the I/O this run is
+    # made of (CDP WebSocket frames, LLM HTTPS streams, subprocess pipes);
+    # it's an optional dependency because it doesn't build on Windows, where
+    # the default Proactor loop already handles subprocess I/O well.
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(async_main())
+    else:
+        uvloop.run(async_main())
 
 
 if __name__ == "__main__":
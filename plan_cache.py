@@ -0,0 +1,89 @@
+# plan_cache.py
+"""Content-addressable cache of action sequences from successful task runs.
+
+Keyed by a fingerprint of (url, instructions), so re-running an unchanged
+task can reuse what worked last time instead of re-planning from scratch.
+Entries are one pickle (protocol 5) file per fingerprint under .plan_cache/,
+written atomically, with a 7-day TTL and size-based LRU eviction. Pickle is
+fine here -- the cache only ever holds plans this orchestrator recorded
+locally -- and is faster and smaller than JSON for the nested MCP arg dicts;
+dump_json exists for human inspection.
+"""
+
+import hashlib
+import os
+import pickle
+import time
+from pathlib import Path
+
+from fastjson import dumps_bytes
+
+CACHE_DIR = Path(".plan_cache")
+ENTRY_SUFFIX = ".pkl"
+TTL_SECONDS = 7 * 24 * 3600
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+
+def fingerprint(url: str, instructions: str) -> str:
+    """Stable content hash identifying a task by what it does, not its id."""
+    return hashlib.sha256(f"{url}\0{instructions}".encode()).hexdigest()
+
+
+def get(fp: str) -> list | None:
+    """Return the cached plan for a fingerprint, or None on miss/expiry."""
+    path = CACHE_DIR / f"{fp}{ENTRY_SUFFIX}"
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    if time.time() - stat.st_mtime > TTL_SECONDS:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        return None
+    try:
+        return pickle.loads(path.read_bytes())
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+
+
+def put(fp: str, plan: list) -> None:
+    """Store a plan atomically (write to temp file, then os.replace)."""
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp = CACHE_DIR / f".{fp}.tmp"
+    tmp.write_bytes(pickle.dumps(plan, protocol=5))
+    os.replace(tmp, CACHE_DIR / f"{fp}{ENTRY_SUFFIX}")
+    _evict_lru()
+
+
+def dump_json(fp: str) -> bytes | None:
+    """JSON export of a cached entry, for debugging/inspection only."""
+    plan = get(fp)
+    if plan is None:
+        return None
+    return dumps_bytes(plan)
+
+
+def _evict_lru() -> None:
+    """Drop oldest entries until the cache fits in MAX_CACHE_BYTES."""
+    entries = []
+    total = 0
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith(ENTRY_SUFFIX):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    if total <= MAX_CACHE_BYTES:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= MAX_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
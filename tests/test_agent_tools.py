@@ -1,5 +1,7 @@
 # tests/test_agent_tools.py
-from agent import start_audio_capture, stop_audio_capture
+import asyncio
+
+from agent import CachedMcpToolset, start_audio_capture, stop_audio_capture
 
 
 def test_start_audio_capture_returns_js():
@@ -34,6 +36,98 @@ def test_stop_audio_capture_js_encodes_wav():
     assert "btoa" in js  # base64 encoding
 
 
+def test_cached_toolset_reuses_tool_list(monkeypatch):
+    """get_tools should only hit the MCP server once within the TTL."""
+    calls = 0
+
+    async def fake_get_tools(self, readonly_context=None):
+        nonlocal calls
+        calls += 1
+        return ["tool"]
+
+    monkeypatch.setattr("agent.McpToolset.get_tools", fake_get_tools)
+    toolset = CachedMcpToolset.__new__(CachedMcpToolset)
+    toolset._cache_ttl_seconds = 300.0
+    toolset._cached_tools = None
+    toolset._cache_ts = 0.0
+
+    async def exercise():
+        first = await toolset.get_tools()
+        second = await toolset.get_tools()
+        return first, second
+
+    first, second = asyncio.run(exercise())
+    assert first == second == ["tool"]
+    assert calls == 1
+
+
+def test_filter_tools_keeps_relevant_and_mandatory(monkeypatch):
+    from google.genai import types
+
+    from agent import _filter_tools_by_relevance
+
+    monkeypatch.setattr("agent._TOOL_FILTER_TOP_K", 2)
+    declarations = [
+        types.FunctionDeclaration(name="browser_click", description="Click an element on the page"),
+        types.FunctionDeclaration(name="browser_type", description="Type text into an input field"),
+        types.FunctionDeclaration(name="browser_pdf_save", description="Save the page as PDF"),
+        types.FunctionDeclaration(name="mark_task_complete", description="Finish the task"),
+    ]
+    tool = types.Tool(function_declarations=list(declarations))
+    request = types.GenerateContentConfig(tools=[tool])
+
+    class FakeRequest:
+        contents = [types.Content(role="user", parts=[types.Part(text="Click the login button and type the username")])]
+        config = request
+
+    class FakeContext:
+        state = {}
+
+    ctx = FakeContext()
+    _filter_tools_by_relevance(ctx, FakeRequest())
+    kept = {d.name for d in tool.function_declarations}
+    assert "browser_click" in kept
+    assert "mark_task_complete" in kept  # always retained
+    assert "browser_pdf_save" not in kept
+
+    # The kept set is frozen in state on the first call; a later turn with
+    # different conversation text must yield the same declaration block.
+    assert "kept_tools" in ctx.state
+    tool2 = types.Tool(function_declarations=list(declarations))
+
+    class FakeRequest2:
+        contents = [types.Content(role="user", parts=[types.Part(text="Save the page as a PDF document")])]
+        config = types.GenerateContentConfig(tools=[tool2])
+
+    _filter_tools_by_relevance(ctx, FakeRequest2())
+    assert {d.name for d in tool2.function_declarations} == kept
+
+
+def test_large_tool_result_compacts_and_expands():
+    from agent import _compact_payload, expand_ref
+
+    class FakeContext:
+        state = {}
+
+    ctx = FakeContext()
+    payload = {"tree": "x" * 10000}
+    compacted = _compact_payload(ctx, payload)
+    assert compacted is not None
+    assert compacted["ref"].startswith("blobref:")
+    assert len(compacted["preview"]) <= 256
+    expanded = expand_ref(compacted["ref"], ctx)
+    assert "x" * 10000 in expanded["content"]
+
+
+def test_small_tool_result_not_compacted():
+    from agent import _compact_payload
+
+    class FakeContext:
+        state = {}
+
+    assert _compact_payload(FakeContext(), {"ok": True}) is None
+
+
 def test_task_instruction_mentions_audio_capture():
     from agent import TASK_INSTRUCTION
     assert "start_audio_capture" in TASK_INSTRUCTION
@@ -0,0 +1,71 @@
+# tests/test_db.py
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from db import (
+    export_to_xlsx,
+    import_xlsx_to_sqlite,
+    open_db,
+    read_pending_tasks,
+    update_task_result,
+)
+from excel_io import Task
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_db(tmp_path / "tasks.db")
+    conn.execute(
+        "INSERT INTO tasks (task_id, url, instructions, status) VALUES"
+        " ('T001', 'https://example.com', 'Click login', NULL),"
+        " ('T002', 'https://example.org', 'Fill search', 'success')"
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_read_pending_tasks_skips_completed(conn):
+    tasks = read_pending_tasks(conn)
+    assert tasks == [Task(task_id="T001", url="https://example.com", instructions="Click login")]
+
+
+def test_update_task_result_writes_row(conn):
+    update_task_result(conn, "T001", "pics/T001.png", "success", "", audio_link="audio/T001.wav")
+    row = conn.execute(
+        "SELECT screenshot_link, status, audio_link FROM tasks WHERE task_id='T001'"
+    ).fetchone()
+    assert row == ("pics/T001.png", "success", "audio/T001.wav")
+
+
+def test_update_task_result_raises_on_missing_id(conn):
+    with pytest.raises(ValueError, match="NONEXISTENT"):
+        update_task_result(conn, "NONEXISTENT", "", "failed", "not found")
+
+
+def test_import_xlsx_to_sqlite(tmp_path):
+    xlsx = tmp_path / "tasks.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["task_id", "url", "instructions", "status"])
+    ws.append(["T001", "https://example.com", "Click login", None])
+    ws.append(["T002", "https://example.org", "Fill search", "success"])
+    wb.save(xlsx)
+
+    imported = import_xlsx_to_sqlite(xlsx, tmp_path / "tasks.db")
+    assert imported == 2
+    conn = open_db(tmp_path / "tasks.db")
+    try:
+        assert [t.task_id for t in read_pending_tasks(conn)] == ["T001"]
+    finally:
+        conn.close()
+
+
+def test_export_to_xlsx_snapshot(conn, tmp_path):
+    out = tmp_path / "snapshot.xlsx"
+    export_to_xlsx(conn, out)
+    wb = load_workbook(out)
+    ws = wb.active
+    headers = [cell.value for cell in ws[1]]
+    assert headers[:3] == ["task_id", "url", "instructions"]
+    assert ws.max_row == 3
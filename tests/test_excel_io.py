@@ -1,7 +1,14 @@
 # tests/test_excel_io.py
 import pytest
 from openpyxl import Workbook, load_workbook
-from excel_io import Task, read_tasks, update_task_result
+from excel_io import (
+    Task,
+    open_results_workbook,
+    read_tasks,
+    update_task_result,
+    update_task_results_bulk,
+    update_task_result_in_ws,
+)
 
 
 @pytest.fixture
@@ -100,3 +107,82 @@ def test_update_task_result_audio_link_empty_by_default(sample_xlsx):
     assert "audio_link" in headers
     row2 = [cell.value for cell in ws[2]]
     assert row2[headers.index("audio_link")] is None or row2[headers.index("audio_link")] == ""
+
+
+def test_open_results_workbook_builds_indexes(sample_xlsx):
+    wb, col_idx, row_idx = open_results_workbook(sample_xlsx)
+    assert row_idx == {"T001": 2, "T002": 3}
+    for name in ("screenshot_link", "status", "error", "explanation", "audio_link"):
+        assert name in col_idx
+
+
+def test_update_task_result_in_ws_writes_without_reload(sample_xlsx):
+    wb, col_idx, row_idx = open_results_workbook(sample_xlsx)
+    ws = wb.active
+    update_task_result_in_ws(ws, col_idx, row_idx, "T001", "pics/T001.png", "success", "")
+    update_task_result_in_ws(ws, col_idx, row_idx, "T002", "", "failed", "timeout")
+    wb.save(sample_xlsx)
+
+    wb2 = load_workbook(sample_xlsx)
+    ws2 = wb2.active
+    headers = [cell.value for cell in ws2[1]]
+    row2 = [cell.value for cell in ws2[2]]
+    row3 = [cell.value for cell in ws2[3]]
+    assert row2[headers.index("status")] == "success"
+    assert row3[headers.index("error")] == "timeout"
+
+
+def test_update_task_result_in_ws_unknown_id_raises(sample_xlsx):
+    wb, col_idx, row_idx = open_results_workbook(sample_xlsx)
+    with pytest.raises(ValueError, match="NONEXISTENT"):
+        update_task_result_in_ws(wb.active, col_idx, row_idx, "NONEXISTENT", "", "failed", "")
+
+def test_read_tasks_empty_sheet_returns_no_tasks(tmp_path):
+    path = tmp_path / "tasks.xlsx"
+    Workbook().save(path)
+    assert read_tasks(path) == []
+
+def test_update_task_results_bulk_writes_all_rows(sample_xlsx):
+    update_task_results_bulk(sample_xlsx, [
+        {"task_id": "T001", "screenshot_link": "pics/T001.png", "status": "success", "error": ""},
+        {"task_id": "T002", "screenshot_link": "", "status": "failed", "error": "timeout"},
+    ])
+    wb = load_workbook(sample_xlsx)
+    ws = wb.active
+    headers = [cell.value for cell in ws[1]]
+    status_col = headers.index("status") + 1
+    assert ws.cell(row=2, column=status_col).value == "success"
+    assert ws.cell(row=3, column=status_col).value == "failed"
+
+def test_update_task_results_bulk_streaming_path(sample_xlsx, monkeypatch):
+    import excel_io
+    monkeypatch.setattr(excel_io, "STREAM_REWRITE_THRESHOLD", 0)
+    update_task_results_bulk(sample_xlsx, [
+        {"task_id": "T002", "screenshot_link": "pics/T002.png", "status": "success", "error": ""},
+    ])
+    wb = load_workbook(sample_xlsx)
+    ws = wb.active
+    headers = [cell.value for cell in ws[1]]
+    assert "audio_link" in headers
+    status_col = headers.index("status") + 1
+    assert ws.cell(row=3, column=status_col).value == "success"
+    # Untouched rows survive the rewrite
+    assert ws.cell(row=2, column=1).value == "T001"
+    assert ws.cell(row=2, column=3).value == "Click the login button"
+
+def test_update_task_results_bulk_streaming_preserves_other_sheets(sample_xlsx, monkeypatch):
+    import excel_io
+    wb = load_workbook(sample_xlsx)
+    task_title = wb.active.title
+    notes = wb.create_sheet(title="notes")
+    notes.append(["note"])
+    notes.append(["keep me"])
+    wb.save(sample_xlsx)
+
+    monkeypatch.setattr(excel_io, "STREAM_REWRITE_THRESHOLD", 0)
+    update_task_results_bulk(sample_xlsx, [
+        {"task_id": "T001", "screenshot_link": "", "status": "success", "error": ""},
+    ])
+    wb = load_workbook(sample_xlsx)
+    assert wb.sheetnames == [task_title, "notes"]
+    assert wb["notes"].cell(row=2, column=1).value == "keep me"
@@ -0,0 +1,37 @@
+# tests/test_plan_cache.py
+import os
+import time
+
+import plan_cache
+
+
+def test_fingerprint_is_stable_and_content_based():
+    a = plan_cache.fingerprint("https://example.com", "click login")
+    b = plan_cache.fingerprint("https://example.com", "click login")
+    c = plan_cache.fingerprint("https://example.com", "click logout")
+    assert a == b
+    assert a != c
+
+
+def test_put_get_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_cache, "CACHE_DIR", tmp_path / "cache")
+    fp = plan_cache.fingerprint("https://example.com", "click login")
+    plan = [{"tool": "browser_click", "args": {"ref": "e5"}}]
+    plan_cache.put(fp, plan)
+    assert plan_cache.get(fp) == plan
+
+
+def test_get_misses_unknown_fingerprint(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_cache, "CACHE_DIR", tmp_path / "cache")
+    assert plan_cache.get("deadbeef") is None
+
+
+def test_expired_entry_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_cache, "CACHE_DIR", tmp_path / "cache")
+    fp = plan_cache.fingerprint("https://example.com", "click login")
+    plan_cache.put(fp, [{"tool": "browser_click", "args": {}}])
+    entry = tmp_path / "cache" / f"{fp}{plan_cache.ENTRY_SUFFIX}"
+    old = time.time() - plan_cache.TTL_SECONDS - 60
+    os.utime(entry, (old, old))
+    assert plan_cache.get(fp) is None
+    assert not entry.exists()